@@ -5,6 +5,8 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdi
 from PyQt5.QtGui import QPixmap, QPainter, QColor, QPen, QBrush
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 
+from attached_assets.position_formula import evaluate_formula
+
 class AnchorPositionEditor(QWidget):
     """
     Новый интуитивный редактор позиций с использованием якорных точек.
@@ -16,6 +18,15 @@ class AnchorPositionEditor(QWidget):
         super().__init__()
         self.config_manager = config_manager
         self.current_anchor = "top-left"  # Якорь по умолчанию
+        # Статический слой предпросмотра (холст, отступы, центральные линии) и его ключ
+        self._background_pixmap = None
+        self._background_key = None
+        self._background_layout = None
+        # Перерисовка при изменении значений откладывается до следующего кадра
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(16)
+        self._preview_timer.timeout.connect(self.update_preview)
         self.initUI()
     
     def initUI(self):
@@ -70,7 +81,7 @@ class AnchorPositionEditor(QWidget):
         self.x_coord_spinbox = QSpinBox()
         self.x_coord_spinbox.setRange(0, 2000)
         self.x_coord_spinbox.setValue(30)
-        self.x_coord_spinbox.valueChanged.connect(self.update_preview)
+        self.x_coord_spinbox.valueChanged.connect(self.schedule_preview)
         
         self.x_formula_combo = QComboBox()
         self.x_formula_combo.addItems([
@@ -79,7 +90,7 @@ class AnchorPositionEditor(QWidget):
             "Центр холста",
             "Правый край с отступом (MARGIN)"
         ])
-        self.x_formula_combo.currentIndexChanged.connect(self.update_preview)
+        self.x_formula_combo.currentIndexChanged.connect(self.schedule_preview)
         
         x_layout.addWidget(self.x_coord_spinbox)
         x_layout.addWidget(self.x_formula_combo)
@@ -90,7 +101,7 @@ class AnchorPositionEditor(QWidget):
         self.y_coord_spinbox = QSpinBox()
         self.y_coord_spinbox.setRange(0, 2000)
         self.y_coord_spinbox.setValue(30)
-        self.y_coord_spinbox.valueChanged.connect(self.update_preview)
+        self.y_coord_spinbox.valueChanged.connect(self.schedule_preview)
         
         self.y_formula_combo = QComboBox()
         self.y_formula_combo.addItems([
@@ -99,7 +110,7 @@ class AnchorPositionEditor(QWidget):
             "Центр холста",
             "Нижний край с отступом (MARGIN)"
         ])
-        self.y_formula_combo.currentIndexChanged.connect(self.update_preview)
+        self.y_formula_combo.currentIndexChanged.connect(self.schedule_preview)
         
         y_layout.addWidget(self.y_coord_spinbox)
         y_layout.addWidget(self.y_formula_combo)
@@ -242,6 +253,56 @@ class AnchorPositionEditor(QWidget):
         for pos_id in positions.keys():
             self.positions_combo.addItem(pos_id)
     
+    def schedule_preview(self, *args):
+        """Отложить обновление предпросмотра: серия изменений дает одну перерисовку."""
+        self._preview_timer.start()
+    
+    def _get_background(self, canvas_width, canvas_height, margin):
+        """
+        Получить статический слой предпросмотра и параметры масштаба.
+        Слой перерисовывается только при изменении размера области или настроек холста.
+        """
+        key = (self.preview_canvas.width(), self.preview_canvas.height(),
+               canvas_width, canvas_height, margin)
+        if self._background_key != key:
+            pixmap = QPixmap(self.preview_canvas.width(), self.preview_canvas.height())
+            pixmap.fill(Qt.white)
+            
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            
+            # Масштабируем для отображения
+            scale_factor = min(self.preview_canvas.width() / canvas_width, 
+                              self.preview_canvas.height() / canvas_height) * 0.9
+            display_width = int(canvas_width * scale_factor)
+            display_height = int(canvas_height * scale_factor)
+            
+            # Центрируем отображение
+            offset_x = (self.preview_canvas.width() - display_width) // 2
+            offset_y = (self.preview_canvas.height() - display_height) // 2
+            
+            # Рисуем фон холста
+            painter.fillRect(offset_x, offset_y, display_width, display_height, QColor(211, 211, 211))
+            
+            # Рисуем границы отступов
+            painter.setPen(QPen(QColor(150, 150, 150), 1))
+            margin_scaled = int(margin * scale_factor)
+            painter.drawRect(offset_x + margin_scaled, offset_y + margin_scaled, 
+                           display_width - 2 * margin_scaled, display_height - 2 * margin_scaled)
+            
+            # Рисуем центральные линии
+            painter.setPen(QPen(QColor(100, 100, 100), 1, Qt.DashLine))
+            center_x = offset_x + display_width // 2
+            center_y = offset_y + display_height // 2
+            painter.drawLine(center_x, offset_y, center_x, offset_y + display_height)
+            painter.drawLine(offset_x, center_y, offset_x + display_width, center_y)
+            painter.end()
+            
+            self._background_pixmap = pixmap
+            self._background_layout = (scale_factor, display_width, display_height, offset_x, offset_y)
+            self._background_key = key
+        return self._background_pixmap, self._background_layout
+    
     def update_preview(self):
         """Обновить предпросмотр позиции."""
         if not hasattr(self, 'preview_canvas') or not self.preview_canvas:
@@ -266,9 +327,10 @@ class AnchorPositionEditor(QWidget):
         # Обновляем метку с формулами
         self.formula_label.setText(f"X: {x_formula}\nY: {y_formula}\nЯкорь: {self.current_anchor}")
         
-        # Создаем пиксмап для рисования
-        pixmap = QPixmap(self.preview_canvas.width(), self.preview_canvas.height())
-        pixmap.fill(Qt.white)
+        # Статический слой берется из кэша, поверх рисуется только инфографика и якорь
+        background, layout = self._get_background(canvas_width, canvas_height, margin)
+        scale_factor, display_width, display_height, offset_x, offset_y = layout
+        pixmap = QPixmap(background)
         
         painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing)
@@ -277,32 +339,6 @@ class AnchorPositionEditor(QWidget):
         sample_width = 300
         sample_height = 300
         
-        # Масштабируем для отображения
-        scale_factor = min(self.preview_canvas.width() / canvas_width, 
-                          self.preview_canvas.height() / canvas_height) * 0.9
-        display_width = int(canvas_width * scale_factor)
-        display_height = int(canvas_height * scale_factor)
-        
-        # Центрируем отображение
-        offset_x = (self.preview_canvas.width() - display_width) // 2
-        offset_y = (self.preview_canvas.height() - display_height) // 2
-        
-        # Рисуем фон холста
-        painter.fillRect(offset_x, offset_y, display_width, display_height, QColor(211, 211, 211))
-        
-        # Рисуем границы отступов
-        painter.setPen(QPen(QColor(150, 150, 150), 1))
-        margin_scaled = int(margin * scale_factor)
-        painter.drawRect(offset_x + margin_scaled, offset_y + margin_scaled, 
-                       display_width - 2 * margin_scaled, display_height - 2 * margin_scaled)
-        
-        # Рисуем центральные линии
-        painter.setPen(QPen(QColor(100, 100, 100), 1, Qt.DashLine))
-        center_x = offset_x + display_width // 2
-        center_y = offset_y + display_height // 2
-        painter.drawLine(center_x, offset_y, center_x, offset_y + display_height)
-        painter.drawLine(offset_x, center_y, offset_x + display_width, center_y)
-        
         try:
             # Вычисляем позицию на основе формул
             context = {
@@ -313,8 +349,8 @@ class AnchorPositionEditor(QWidget):
                 "MARGIN": margin
             }
             
-            x_pos = eval(x_formula, {"__builtins__": {}}, context)
-            y_pos = eval(y_formula, {"__builtins__": {}}, context)
+            x_pos = evaluate_formula(x_formula, context)
+            y_pos = evaluate_formula(y_formula, context)
             
             # Получаем смещение для якорной точки
             anchor_x_offset, anchor_y_offset = self.config_manager.get_anchor_offset(
@@ -361,13 +397,12 @@ class AnchorPositionEditor(QWidget):
         painter.end()
         
         # Отображаем результат на канвасе
-        if hasattr(self, '_preview_label'):
-            self._preview_label.setPixmap(pixmap)
-        else:
+        if not hasattr(self, '_preview_label'):
             self._preview_label = QLabel(self.preview_canvas)
-            self._preview_label.setGeometry(0, 0, self.preview_canvas.width(), self.preview_canvas.height())
-            self._preview_label.setPixmap(pixmap)
             self._preview_label.show()
+        # Размер метки следует за областью предпросмотра (фон перерисовывается при изменении)
+        self._preview_label.setGeometry(0, 0, self.preview_canvas.width(), self.preview_canvas.height())
+        self._preview_label.setPixmap(pixmap)
             
     def load_selected_position(self):
         """Загрузить выбранную позицию для редактирования."""
@@ -423,7 +458,7 @@ class AnchorPositionEditor(QWidget):
                 # Пытаемся извлечь смещение
                 try:
                     context = {"MARGIN": margin}
-                    x_value = eval(x_formula, {"__builtins__": {}}, context)
+                    x_value = evaluate_formula(x_formula, context)
                     self.x_coord_spinbox.setValue(x_value)
                 except:
                     self.x_coord_spinbox.setValue(margin)
@@ -431,7 +466,7 @@ class AnchorPositionEditor(QWidget):
             self.x_formula_combo.setCurrentIndex(2)  # Центр холста
             try:
                 context = {"canvas_width": canvas_width}
-                x_value = eval(x_formula, {"__builtins__": {}}, context)
+                x_value = evaluate_formula(x_formula, context)
                 self.x_coord_spinbox.setValue(x_value)
             except:
                 self.x_coord_spinbox.setValue(canvas_width // 2)
@@ -439,7 +474,7 @@ class AnchorPositionEditor(QWidget):
             self.x_formula_combo.setCurrentIndex(3)  # Правый край
             try:
                 context = {"canvas_width": canvas_width, "MARGIN": margin}
-                x_value = eval(x_formula, {"__builtins__": {}}, context)
+                x_value = evaluate_formula(x_formula, context)
                 self.x_coord_spinbox.setValue(x_value)
             except:
                 self.x_coord_spinbox.setValue(canvas_width - margin)
@@ -460,7 +495,7 @@ class AnchorPositionEditor(QWidget):
                 # Пытаемся извлечь смещение
                 try:
                     context = {"MARGIN": margin}
-                    y_value = eval(y_formula, {"__builtins__": {}}, context)
+                    y_value = evaluate_formula(y_formula, context)
                     self.y_coord_spinbox.setValue(y_value)
                 except:
                     self.y_coord_spinbox.setValue(margin)
@@ -468,7 +503,7 @@ class AnchorPositionEditor(QWidget):
             self.y_formula_combo.setCurrentIndex(2)  # Центр холста
             try:
                 context = {"canvas_height": canvas_height}
-                y_value = eval(y_formula, {"__builtins__": {}}, context)
+                y_value = evaluate_formula(y_formula, context)
                 self.y_coord_spinbox.setValue(y_value)
             except:
                 self.y_coord_spinbox.setValue(canvas_height // 2)
@@ -476,7 +511,7 @@ class AnchorPositionEditor(QWidget):
             self.y_formula_combo.setCurrentIndex(3)  # Нижний край
             try:
                 context = {"canvas_height": canvas_height, "MARGIN": margin}
-                y_value = eval(y_formula, {"__builtins__": {}}, context)
+                y_value = evaluate_formula(y_formula, context)
                 self.y_coord_spinbox.setValue(y_value)
             except:
                 self.y_coord_spinbox.setValue(canvas_height - margin)
@@ -1,14 +1,22 @@
 import streamlit as st
 import os
+import sys
 import pandas as pd
 import json
 from PIL import Image
 import tempfile
 import shutil
 
-from config_manager import ConfigManager
-from image_processor import ImageProcessor
-from position_editor import PositionEditor
+# Добавляем корневую директорию проекта в путь Python
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from attached_assets.config_manager import ConfigManager
+from attached_assets.image_processor import ImageProcessor
+from attached_assets.position_editor import PositionEditor
+from attached_assets.slide_index import SlideIndex
+from attached_assets.photo_scanner import scan_articles, list_images, article_relpath
 
 # Set page config
 st.set_page_config(
@@ -27,6 +35,13 @@ if 'image_processor' not in st.session_state:
 if 'position_editor' not in st.session_state:
     st.session_state.position_editor = PositionEditor(st.session_state.config_manager)
 
+
+@st.cache_resource
+def load_slide_index(excel_file, mtime):
+    """Parse the workbook once per (path, mtime) and share the index across reruns."""
+    return SlideIndex.from_excel(excel_file)
+
+
 # Set up the sidebar for configuration options
 st.sidebar.title("Settings")
 
@@ -68,7 +83,9 @@ with tab2:
     # Sample image selection
     valid_dirs = []
     if os.path.exists(photos_dir):
-        valid_dirs = [d for d in os.listdir(photos_dir) if os.path.isdir(os.path.join(photos_dir, d))]
+        scan_depth = st.session_state.config_manager.get_settings().get("scan_depth", 1)
+        valid_dirs = [article_relpath(photos_dir, image_paths)
+                      for _, image_paths in scan_articles(photos_dir, max_depth=scan_depth)]
     
     if not valid_dirs:
         st.warning("No valid article directories found in the photos directory.")
@@ -77,9 +94,7 @@ with tab2:
         
         # Get sample images from the selected article directory
         article_dir = os.path.join(photos_dir, article)
-        image_files = [f for f in os.listdir(article_dir) 
-                      if os.path.isfile(os.path.join(article_dir, f)) and 
-                      f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp'))]
+        image_files = [os.path.basename(path) for path in list_images(article_dir)]
         
         if not image_files:
             st.warning("No image files found in the selected article directory.")
@@ -159,31 +174,29 @@ with tab3:
                 # Read Excel file
                 status_text.text("Reading Excel file...")
                 try:
-                    df = pd.read_excel(excel_file, dtype=str).fillna('')
-                    data = df.values.tolist()
+                    slide_index = load_slide_index(excel_file, os.path.getmtime(excel_file))
                 except Exception as e:
                     st.error(f"Error reading Excel file: {str(e)}")
-                    data = []
+                    slide_index = None
                 
-                if data:
-                    # Create output directory
-                    if not os.path.exists(output_dir):
-                        os.makedirs(output_dir)
-                    
+                if slide_index is not None:
                     # Process images
                     status_text.text("Processing images...")
                     try:
-                        total_processed = st.session_state.image_processor.generate_cards(
-                            data, photos_dir, infografika_dir, output_dir,
+                        total_processed, final_output_dir = st.session_state.image_processor.generate_cards(
+                            excel_file, photos_dir, infografika_dir, output_dir,
                             canvas_width, canvas_height, margin, 
-                            progress_callback=lambda x, total: progress_bar.progress(x/total)
+                            progress_callback=lambda x, total: progress_bar.progress(x/total),
+                            slide_index=slide_index,
+                            scan_depth=st.session_state.config_manager.get_settings().get("scan_depth", 1),
+                            progress_max_rate=st.session_state.config_manager.get_settings().get("progress_max_rate", 10),
+                            output_sizes=st.session_state.config_manager.get_settings().get("output_sizes", []),
+                            variants=st.session_state.config_manager.get_settings().get("marketplace_variants", [])
                         )
                         progress_bar.progress(1.0)
-                        st.success(f"Successfully processed {total_processed} images!")
+                        st.success(f"Successfully processed {total_processed} images into {final_output_dir}!")
                     except Exception as e:
                         st.error(f"Error processing images: {str(e)}")
-                else:
-                    st.warning("No data found in Excel file.")
             except Exception as e:
                 st.error(f"An error occurred: {str(e)}")
 
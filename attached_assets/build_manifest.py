@@ -0,0 +1,114 @@
+import os
+import json
+import hashlib
+
+MANIFEST_NAME = ".manifest.json"
+MANIFEST_VERSION = 1
+
+
+class BuildManifest:
+    """
+    Manifest of content hashes for the cards in a stable output directory.
+    A card is re-rendered only when the hash of its inputs (source photo,
+    overlay PNGs, position definitions, canvas settings and render version) changes.
+    File digests are cached by (size, mtime) so unchanged files are not re-read.
+    A card recorded under a new extension (the output profile changed) replaces
+    the cards of the same name with other extensions: their files are deleted.
+    """
+
+    def __init__(self, output_dir):
+        """Initialize and load the manifest stored in output_dir, if any."""
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.files = {}
+        self.cards = {}
+        self._load()
+        # Записанные карточки по имени без расширения
+        self._names = {}
+        for card_id in self.cards:
+            self._names.setdefault(os.path.splitext(card_id)[0], set()).add(card_id)
+
+    def _load(self):
+        """Load the manifest; a missing or unreadable manifest means a full rebuild."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = data.get("files", {})
+                self.cards = data.get("cards", {})
+        except Exception as e:
+            print(f"Ошибка чтения манифеста {self.path}: {e}")
+
+    def save(self):
+        """Write the manifest atomically (temp file + rename)."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files, "cards": self.cards},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def file_digest(self, path):
+        """Get the SHA-1 of a file's content, reusing the cached digest if size and mtime match."""
+        abs_path = os.path.abspath(path)
+        stat = os.stat(abs_path)
+        cached = self.files.get(abs_path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha1()
+        with open(abs_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        self.files[abs_path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def card_key(self, photo_path, overlays, positions, render_settings):
+        """
+        Compute the input hash of a card.
+        overlays is a sequence of (infografika_path, position_id);
+        positions is the position config dict; render_settings is any JSON-able value
+        (canvas size, margin, render version, ...).
+        """
+        payload = {
+            "photo": self.file_digest(photo_path),
+            "overlays": [
+                [self.file_digest(path), str(position), positions.get(str(position))]
+                for path, position in overlays
+            ],
+            "settings": render_settings,
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha1(encoded).hexdigest()
+
+    def _card_id(self, output_path):
+        return os.path.relpath(output_path, self.output_dir)
+
+    def is_current(self, output_path, key):
+        """Check whether the card exists on disk and was rendered from the same inputs."""
+        return self.cards.get(self._card_id(output_path)) == key and os.path.exists(output_path)
+
+    def record(self, output_path, key):
+        """
+        Record a successfully rendered card. Cards of the same name with another
+        extension, rendered with a previous output profile, are removed.
+        """
+        card_id = self._card_id(output_path)
+        names = self._names.setdefault(os.path.splitext(card_id)[0], set())
+        for stale_id in names - {card_id}:
+            self._remove_card(stale_id)
+            names.discard(stale_id)
+        names.add(card_id)
+        self.cards[card_id] = key
+
+    def _remove_card(self, card_id):
+        """Delete an outdated card file and its entry."""
+        path = os.path.join(self.output_dir, card_id)
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                print(f"Удалена устаревшая карточка {path}")
+        except OSError as e:
+            print(f"Не удалось удалить устаревшую карточку {path}: {e}")
+        self.cards.pop(card_id, None)
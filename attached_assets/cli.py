@@ -0,0 +1,305 @@
+"""
+Консольный интерфейс для пакетной обработки без графического интерфейса.
+Не импортирует PyQt5; тяжелые модули загружаются только при запуске команды.
+
+Пример:
+    python -m card_generator render --workers 0 --profile jpeg
+    python -m card_generator watch --interval 2
+    python -m card_generator serve --port 8000
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import contextlib
+
+# Коды завершения
+EXIT_OK = 0
+EXIT_FAILED_CARDS = 1
+EXIT_ERROR = 2
+
+
+def _parse_sizes(value):
+    """Parse a "WxH,WxH" list of output sizes."""
+    try:
+        sizes = [[int(part) for part in size.lower().split("x")] for size in value.split(",") if size]
+    except ValueError:
+        sizes = None
+    if not sizes or any(len(size) != 2 for size in sizes):
+        raise argparse.ArgumentTypeError(f"Некорректный список размеров: {value}")
+    return sizes
+
+
+def _add_common_arguments(parser):
+    """Add the config.json overrides shared by all commands (None = keep the setting)."""
+    parser.add_argument("--config", default="config.json", help="Файл конфигурации")
+    parser.add_argument("--excel", dest="excel_file", help="Excel файл с инфографикой")
+    parser.add_argument("--photos", dest="photos_dir", help="Директория с фотографиями")
+    parser.add_argument("--infografika", dest="infografika_dir", help="Директория с инфографикой")
+    parser.add_argument("--scan-depth", dest="scan_depth", type=int, help="Глубина поиска артикулов")
+    parser.add_argument("--variants", dest="marketplace_variants",
+                        help="Варианты маркетплейсов через запятую, например WB,OZON")
+    parser.add_argument("--profile", dest="output_profile", help="Профиль вывода")
+    parser.add_argument("--workers", type=int, help="Число процессов (0 = все ядра)")
+    parser.add_argument("--memory-budget", dest="memory_budget_mb", type=int,
+                        help="Бюджет памяти на карточки в обработке, МБ (0 = без ограничения)")
+    parser.add_argument("--compositor", choices=("pil", "numpy"),
+                        help="Наложение инфографики: pil или numpy")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Выводить журнал обработки (в stderr)")
+
+
+def _add_output_arguments(parser):
+    """Add the output directory and size overrides of the commands that write cards to a folder."""
+    parser.add_argument("--output", dest="output_dir", help="Выходная директория")
+    parser.add_argument("--sizes", dest="output_sizes", type=_parse_sizes,
+                        help="Несколько размеров за один проход, например 2000x3000,1000x1500")
+
+
+def _add_render_arguments(parser):
+    """Add the overrides of the render command."""
+    parser.add_argument("--width", dest="canvas_width", type=int, help="Ширина холста")
+    parser.add_argument("--height", dest="canvas_height", type=int, help="Высота холста")
+    parser.add_argument("--margin", type=int, help="Отступ")
+    parser.add_argument("--pipeline-depth", dest="pipeline_depth", type=int,
+                        help="Карточек в очередях конвейера чтение/отрисовка/запись (0 = без конвейера)")
+    parser.add_argument("--incremental", action="store_true", default=None,
+                        help="Перерисовывать только измененные карточки")
+    parser.add_argument("--resume", action="store_true",
+                        help="Продолжить прерванную обработку в ее выходной директории")
+
+
+def _resolve_settings(config_manager, args):
+    """Merge config.json settings with the command line overrides."""
+    settings = dict(config_manager.get_settings())
+    for key in ("excel_file", "photos_dir", "infografika_dir", "output_dir", "canvas_width",
+                "canvas_height", "margin", "workers", "scan_depth", "output_profile", "incremental",
+                "output_sizes", "marketplace_variants", "watch_interval", "pipeline_depth",
+                "memory_budget_mb", "compositor"):
+        value = getattr(args, key, None)
+        if value is not None:
+            settings[key] = value
+    return settings
+
+
+@contextlib.contextmanager
+def _redirect_stdout(stream):
+    """
+    Redirect stdout to stream at the file descriptor level, so that the output
+    of worker processes does not mix with the JSON summary either.
+    """
+    sys.stdout.flush()
+    saved_fd = os.dup(1)
+    try:
+        os.dup2(stream.fileno(), 1)
+        with contextlib.redirect_stdout(stream):
+            yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved_fd, 1)
+        os.close(saved_fd)
+
+
+def _print_summary(summary):
+    """Write the JSON summary to stdout."""
+    sys.stdout.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def cmd_render(args):
+    """Render all cards once and report a JSON summary."""
+    start_time = time.perf_counter()
+    # Журнал обработки уходит в stderr (или отбрасывается), stdout остается только для итогов
+    log = sys.stderr if args.verbose else open(os.devnull, "w", encoding="utf-8")
+    try:
+        with _redirect_stdout(log):
+            from attached_assets.config_manager import ConfigManager
+            from attached_assets.image_processor import ImageProcessor
+
+            config_manager = ConfigManager(args.config)
+            settings = _resolve_settings(config_manager, args)
+            image_processor = ImageProcessor(config_manager, settings.get("compositor"))
+            image_processor.generate_cards(
+                settings.get("excel_file", "data.xlsx"),
+                settings.get("photos_dir", "photos"),
+                settings.get("infografika_dir", "infografika"),
+                settings.get("output_dir", "output"),
+                settings.get("canvas_width", 900),
+                settings.get("canvas_height", 1200),
+                settings.get("margin", 30),
+                workers=settings.get("workers", 1),
+                incremental=settings.get("incremental", False),
+                scan_depth=settings.get("scan_depth", 1),
+                output_profile=settings.get("output_profile"),
+                output_sizes=settings.get("output_sizes"),
+                variants=settings.get("marketplace_variants"),
+                resume=args.resume,
+                pipeline_depth=settings.get("pipeline_depth"),
+                memory_budget_mb=settings.get("memory_budget_mb"),
+            )
+    except Exception as e:
+        _print_summary({"status": "error", "error": str(e),
+                        "elapsed": round(time.perf_counter() - start_time, 3)})
+        return EXIT_ERROR
+    finally:
+        if log is not sys.stderr:
+            log.close()
+
+    failed = image_processor.last_run["failed"]
+    summary = {"status": "ok" if failed == 0 else "failed"}
+    summary.update(image_processor.last_run)
+    summary["elapsed"] = round(time.perf_counter() - start_time, 3)
+    _print_summary(summary)
+    return EXIT_OK if failed == 0 else EXIT_FAILED_CARDS
+
+
+def cmd_watch(args):
+    """Watch the photo folder and the Excel file, rendering changed cards until interrupted."""
+    # Итоги каждого пакета пишутся JSON-строкой в исходный stdout
+    summary_stream = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    log = sys.stderr if args.verbose else open(os.devnull, "w", encoding="utf-8")
+    watcher = None
+    try:
+        with _redirect_stdout(log):
+            from attached_assets.config_manager import ConfigManager
+            from attached_assets.image_processor import ImageProcessor
+            from attached_assets.hot_folder import HotFolderWatcher
+
+            config_manager = ConfigManager(args.config)
+            settings = _resolve_settings(config_manager, args)
+            watcher = HotFolderWatcher(
+                ImageProcessor(config_manager, settings.get("compositor")),
+                settings.get("excel_file", "data.xlsx"),
+                settings.get("photos_dir", "photos"),
+                settings.get("infografika_dir", "infografika"),
+                settings.get("output_dir", "output"),
+                scan_depth=settings.get("scan_depth", 1),
+                workers=settings.get("workers", 1),
+                interval=settings.get("watch_interval", 2),
+                output_profile=settings.get("output_profile"),
+                output_sizes=settings.get("output_sizes"),
+                variants=settings.get("marketplace_variants"),
+                memory_budget_mb=settings.get("memory_budget_mb"),
+            )
+
+            def report(summary):
+                summary_stream.write(json.dumps(summary, ensure_ascii=False) + "\n")
+                summary_stream.flush()
+
+            # SIGTERM (остановка службы) завершает слежение так же, как Ctrl+C
+            stop_event = threading.Event()
+            signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+            try:
+                watcher.run(
+                    stop_event=stop_event,
+                    on_batch=lambda totals: report(dict({"status": "batch"}, **totals)),
+                    on_error=lambda message: report({"status": "error", "error": message}),
+                )
+            except KeyboardInterrupt:
+                pass
+    except Exception as e:
+        _print_summary({"status": "error", "error": str(e)})
+        return EXIT_ERROR
+    finally:
+        if watcher is not None:
+            watcher.close()
+        if log is not sys.stderr:
+            log.close()
+        summary_stream.close()
+    return EXIT_OK
+
+
+def cmd_serve(args):
+    """Serve cards on demand over HTTP until interrupted."""
+    summary_stream = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    log = sys.stderr if args.verbose else open(os.devnull, "w", encoding="utf-8")
+    service = None
+    try:
+        with _redirect_stdout(log):
+            from attached_assets.config_manager import ConfigManager
+            from attached_assets.image_processor import ImageProcessor
+            from attached_assets.render_service import RenderService, RenderServer
+
+            config_manager = ConfigManager(args.config)
+            settings = _resolve_settings(config_manager, args)
+            service = RenderService(
+                ImageProcessor(config_manager, settings.get("compositor")),
+                settings.get("excel_file", "data.xlsx"),
+                settings.get("photos_dir", "photos"),
+                settings.get("infografika_dir", "infografika"),
+                args.cache_dir,
+                scan_depth=settings.get("scan_depth", 1),
+                workers=settings.get("workers", 1),
+                variants=settings.get("marketplace_variants"),
+                output_profile=settings.get("output_profile"),
+                memory_budget_mb=settings.get("memory_budget_mb"),
+            )
+            server = RenderServer((args.host, args.port), service)
+            host, port = server.server_address[:2]
+            summary_stream.write(json.dumps({"status": "listening", "url": f"http://{host}:{port}"}) + "\n")
+            summary_stream.flush()
+
+            # SIGTERM останавливает сервер так же, как Ctrl+C
+            signal.signal(signal.SIGTERM,
+                          lambda signum, frame: threading.Thread(target=server.shutdown).start())
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.server_close()
+    except Exception as e:
+        _print_summary({"status": "error", "error": str(e)})
+        return EXIT_ERROR
+    finally:
+        if service is not None:
+            service.close()
+        if log is not sys.stderr:
+            log.close()
+        summary_stream.close()
+    return EXIT_OK
+
+
+def build_parser():
+    """Build the argument parser with all subcommands."""
+    parser = argparse.ArgumentParser(
+        prog="card_generator",
+        description="Пакетная генерация карточек товаров без графического интерфейса",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    render_parser = subparsers.add_parser("render", help="Сгенерировать все карточки")
+    _add_common_arguments(render_parser)
+    _add_output_arguments(render_parser)
+    _add_render_arguments(render_parser)
+    render_parser.set_defaults(func=cmd_render)
+
+    watch_parser = subparsers.add_parser("watch", help="Следить за папкой фото и обрабатывать новые артикулы")
+    _add_common_arguments(watch_parser)
+    _add_output_arguments(watch_parser)
+    watch_parser.add_argument("--interval", dest="watch_interval", type=float,
+                              help="Интервал проверки изменений, с")
+    watch_parser.set_defaults(func=cmd_watch)
+
+    serve_parser = subparsers.add_parser("serve", help="HTTP-сервис генерации карточек по запросу")
+    _add_common_arguments(serve_parser)
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Адрес сервера")
+    serve_parser.add_argument("--port", type=int, default=8000, help="Порт сервера (0 = любой свободный)")
+    serve_parser.add_argument("--cache-dir", dest="cache_dir", default="card_cache",
+                              help="Директория кэша готовых карточек")
+    serve_parser.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the command line interface. Returns the exit code."""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
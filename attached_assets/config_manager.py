@@ -1,14 +1,137 @@
 import os
+import copy
 import json
+import threading
+from contextlib import contextmanager
+
+from attached_assets.position_formula import CompiledPosition, PositionFormulaError
 
 class ConfigManager:
     """
     Manages application configuration, including settings and position presets.
     """
-    def __init__(self, config_file="config.json"):
-        """Initialize the configuration manager."""
+    def __init__(self, config_file="config.json", save_delay=None):
+        """
+        Initialize the configuration manager.
+        With save_delay (seconds) changes are written by a debounced background save
+        instead of on every call; call flush() before exit.
+        """
         self.config_file = config_file
+        self.save_delay = save_delay
+        self._init_persistence()
         self.config = self._load_config()
+        # Номер ревизии конфигурации: увеличивается при каждом изменении настроек или позиций
+        self.revision = 0
+        self._compile_positions()
+    
+    def _init_persistence(self):
+        """Reset the state of batches and delayed saves."""
+        self._save_lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
+        self._save_timer = None
+    
+    def __getstate__(self):
+        # Скомпилированные формулы не сериализуются: воркер компилирует их заново
+        state = self.__dict__.copy()
+        state.pop("_compiled", None)
+        state.pop("position_errors", None)
+        # Блокировка и таймер сохранения не переносятся в другой процесс
+        for key in ("_save_lock", "_batch_depth", "_dirty", "_save_timer"):
+            state.pop(key, None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_persistence()
+        self._compile_positions()
+    
+    @contextmanager
+    def batch(self):
+        """
+        Group several changes into one transaction with a single write at the end:
+        
+            with config_manager.batch():
+                for pos_id, pos in positions.items():
+                    config_manager.add_position(pos_id, pos["x"], pos["y"])
+        
+        If the block raises, the configuration is restored to its state before the
+        outermost batch and nothing is written. Batches can be nested; every
+        mutating method runs in its own batch. The lock also keeps a delayed save
+        from serializing the config while it is being changed.
+        """
+        with self._save_lock:
+            if self._batch_depth == 0:
+                snapshot = (copy.deepcopy(self.config), self._dirty)
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.config, self._dirty = snapshot
+                    self._compile_positions()
+                    self.revision += 1
+                raise
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                self._persist()
+    
+    def _changed(self):
+        """Register a change made inside a batch: bump the revision and mark it for saving."""
+        self.revision += 1
+        self._dirty = True
+    
+    def _persist(self):
+        """Write pending changes now, or schedule a debounced write if save_delay is set."""
+        if not self.save_delay:
+            self.flush()
+            return
+        # Каждое новое изменение откладывает запись: серия правок дает одну запись
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+        self._save_timer = threading.Timer(self.save_delay, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+    
+    def flush(self):
+        """Write pending changes to the config file immediately."""
+        with self._save_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            self._dirty = False
+            self._save_config()
+    
+    def _compile_positions(self):
+        """
+        Compile all position formulas once.
+        Invalid positions are reported here and recorded in position_errors.
+        """
+        self._compiled = {}
+        self.position_errors = {}
+        for position_id, position in self.get_positions().items():
+            try:
+                self._compiled[position_id] = CompiledPosition(
+                    position.get("x"), position.get("y"), position.get("anchor", "top-left")
+                )
+            except PositionFormulaError as e:
+                self.position_errors[position_id] = str(e)
+                print(f"Ошибка в формуле позиции {position_id}: {e}")
+    
+    def validate_positions(self, position_ids=None):
+        """
+        Raise PositionFormulaError if any of the given positions (all by default)
+        has an invalid formula.
+        """
+        if position_ids is None:
+            position_ids = self.position_errors.keys()
+        errors = [f"{pid}: {self.position_errors[str(pid)]}" for pid in position_ids
+                  if str(pid) in self.position_errors]
+        if errors:
+            raise PositionFormulaError("Некорректные формулы позиций:\n" + "\n".join(errors))
     
     def _load_config(self):
         """Load configuration from file or create default if not exists."""
@@ -35,19 +158,40 @@ class ConfigManager:
                 "excel_file": "data.xlsx",
                 "canvas_width": 900,
                 "canvas_height": 1200,
-                "margin": 30
+                "margin": 30,
+                "workers": 1,
+                "overlay_cache_size": 64,
+                "canvas_cache_size": 8,
+                "incremental": False,
+                "scan_depth": 1,
+                "progress_max_rate": 10,
+                "output_profile": "png",
+                "sheet_output_profiles": {},
+                "output_sizes": [],
+                "marketplace_variants": [],
+                "watch_interval": 2,
+                "pipeline_depth": 4,
+                "memory_budget_mb": 0,
+                "compositor": "pil"
             },
             "positions": {}
         }
     
     def _save_config(self, config=None):
-        """Save configuration to file."""
+        """Save configuration to file atomically (temp file + rename)."""
         if config is None:
             config = self.config
         
+        # Конфигурация сериализуется под блокировкой, запись идет во временный файл рядом
+        with self._save_lock:
+            data = json.dumps(config, indent=4, ensure_ascii=False)
+        tmp_path = self.config_file + ".tmp"
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=4, ensure_ascii=False)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config_file)
         except Exception as e:
             print(f"Error saving config: {e}")
     
@@ -57,93 +201,79 @@ class ConfigManager:
     
     def update_settings(self, **kwargs):
         """Update settings with provided values."""
-        self.config.setdefault("settings", {})
-        for key, value in kwargs.items():
-            self.config["settings"][key] = value
-        self._save_config()
+        with self.batch():
+            self.config.setdefault("settings", {})
+            for key, value in kwargs.items():
+                self.config["settings"][key] = value
+            self._changed()
     
     def get_positions(self):
         """Get position configurations."""
         return self.config.get("positions", {})
     
     def add_position(self, position_id, x_formula, y_formula, anchor="top-left"):
-        """Add a new position configuration."""
-        self.config.setdefault("positions", {})
-        self.config["positions"][position_id] = {
-            "x": x_formula,
-            "y": y_formula,
-            "anchor": anchor
-        }
-        self._save_config()
+        """Add a new position configuration. Raises PositionFormulaError for invalid formulas."""
+        compiled = CompiledPosition(x_formula, y_formula, anchor)
+        with self.batch():
+            self.config.setdefault("positions", {})
+            self.config["positions"][position_id] = {
+                "x": x_formula,
+                "y": y_formula,
+                "anchor": anchor
+            }
+            self._compiled[position_id] = compiled
+            self.position_errors.pop(position_id, None)
+            self._changed()
     
     def update_position(self, position_id, x_formula, y_formula, anchor=None):
-        """Update an existing position configuration."""
+        """Update an existing position configuration. Raises PositionFormulaError for invalid formulas."""
         if position_id not in self.config.get("positions", {}):
             return False
         
-        self.config["positions"][position_id]["x"] = x_formula
-        self.config["positions"][position_id]["y"] = y_formula
+        compiled = CompiledPosition(
+            x_formula, y_formula,
+            anchor if anchor is not None else self.config["positions"][position_id].get("anchor", "top-left")
+        )
         
-        if anchor is not None:
-            self.config["positions"][position_id]["anchor"] = anchor
+        with self.batch():
+            self.config["positions"][position_id]["x"] = x_formula
+            self.config["positions"][position_id]["y"] = y_formula
+            
+            if anchor is not None:
+                self.config["positions"][position_id]["anchor"] = anchor
             
-        self._save_config()
+            self._compiled[position_id] = compiled
+            self.position_errors.pop(position_id, None)
+            self._changed()
         return True
     
     def delete_position(self, position_id):
         """Delete a position configuration."""
-        if position_id in self.config.get("positions", {}):
-            del self.config["positions"][position_id]
-            self._save_config()
-            return True
+        with self.batch():
+            if position_id in self.config.get("positions", {}):
+                del self.config["positions"][position_id]
+                self._compiled.pop(position_id, None)
+                self.position_errors.pop(position_id, None)
+                self._changed()
+                return True
         return False
     
     def calculate_position(self, position_id, canvas_width, canvas_height, 
                            infografika_width, infografika_height, margin):
         """
         Calculate the actual pixel position for an infographic based on the position formula.
-        Applies appropriate anchor point adjustments.
+        Applies appropriate anchor point adjustments. Uses the formulas compiled at load time;
+        raises PositionFormulaError for a position with an invalid formula.
         """
-        positions = self.get_positions()
-        if str(position_id) not in positions:
+        position_id = str(position_id)
+        compiled = self._compiled.get(position_id)
+        if compiled is None:
+            if position_id in self.position_errors:
+                raise PositionFormulaError(self.position_errors[position_id])
             # Default to top-left if position not found
             return margin, margin
         
-        position = positions[str(position_id)]
-        
-        # Prepare context for formula evaluation
-        context = {
-            "canvas_width": canvas_width,
-            "canvas_height": canvas_height,
-            "infografika_width": infografika_width,
-            "infografika_height": infografika_height,
-            "MARGIN": margin
-        }
-        
-        # Evaluate position formulas
-        try:
-            x = eval(position["x"], {"__builtins__": {}}, context)
-            y = eval(position["y"], {"__builtins__": {}}, context)
-        except Exception as e:
-            print(f"Error evaluating position formula: {e}")
-            return margin, margin
-        
-        # Adjust for anchor point
-        anchor = position.get("anchor", "top-left")
-        
-        # Adjust X based on anchor
-        if "center" in anchor:
-            x -= infografika_width // 2
-        elif "right" in anchor:
-            x -= infografika_width
-        
-        # Adjust Y based on anchor
-        if "middle" in anchor:
-            y -= infografika_height // 2
-        elif "bottom" in anchor:
-            y -= infografika_height
-        
-        return int(x), int(y)
+        return compiled.resolve(canvas_width, canvas_height, infografika_width, infografika_height, margin)
         
     def get_anchor_offset(self, anchor, width, height):
         """
@@ -0,0 +1,203 @@
+import os
+import time
+import threading
+
+from attached_assets.slide_index import SlideIndex
+from attached_assets.render_pool import RenderPool, resolve_workers
+from attached_assets.build_manifest import BuildManifest
+from attached_assets.photo_scanner import scan_articles, article_relpath
+from attached_assets.output_profiles import get_profile
+from attached_assets.marketplace_variants import parse_variants
+from attached_assets.memory_governor import create_budget
+
+
+class HotFolderWatcher:
+    """
+    Long-running watch mode: polls photos_dir and the Excel file and renders only
+    the cards of new or changed article folders and of articles whose Excel rows changed.
+    Folders are detected by polling file sizes and mtimes (os.scandir), so no
+    OS-specific notifier is needed. Output goes to a stable output_dir tracked by a
+    BuildManifest; the slide index, the overlay caches and the worker pool stay warm
+    between batches.
+    """
+
+    def __init__(self, image_processor, excel_file, photos_dir, infografika_dir, output_dir,
+                 scan_depth=1, workers=1, interval=2.0, settle_time=None,
+                 output_profile=None, output_sizes=None, variants=None, memory_budget_mb=None):
+        """
+        Initialize the watcher. A folder is rendered once its newest photo is at
+        least settle_time seconds old (default: interval), so photos still being
+        copied are not picked up half written. memory_budget_mb (default: the
+        "memory_budget_mb" setting) caps the memory of the cards in the worker pool.
+        """
+        self.image_processor = image_processor
+        self.config_manager = image_processor.config_manager
+        self.excel_file = excel_file
+        self.photos_dir = photos_dir
+        self.infografika_dir = infografika_dir
+        self.output_dir = output_dir
+        self.scan_depth = scan_depth
+        self.interval = interval
+        self.settle_time = interval if settle_time is None else settle_time
+
+        settings = self.config_manager.get_settings()
+        self.profile = get_profile(settings, output_profile)
+        self.output_sizes, self.size_subdirs = image_processor.resolve_output_sizes(
+            output_sizes, settings.get("canvas_width", 900), settings.get("canvas_height", 1200))
+        self.variants = parse_variants(variants)
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.manifest = BuildManifest(output_dir)
+
+        # Пул процессов создается один раз и живет между пакетами
+        self.workers = resolve_workers(workers)
+        if memory_budget_mb is None:
+            memory_budget_mb = settings.get("memory_budget_mb", 0)
+        if self.workers > 1:
+            memory_budget = create_budget(memory_budget_mb, self.workers)
+            self.pool = RenderPool(image_processor, self.workers, memory_budget).start()
+        else:
+            self.pool = None
+
+        self.slide_index = None
+        self._excel_signature = None
+        # Подпись папки артикула (имена, размеры и mtime фото) на момент последней обработки
+        self._folders = {}
+
+    def close(self):
+        """Save the manifest and stop the worker pool."""
+        self.manifest.save()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def _file_signature(self, path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _reload_excel(self):
+        """
+        Re-read the Excel file if it changed since the last poll.
+        Returns the set of articles whose rows changed (all articles on the first load).
+        """
+        signature = self._file_signature(self.excel_file)
+        if signature == self._excel_signature:
+            return set()
+        slide_index = SlideIndex.from_excel(self.excel_file)
+        self.config_manager.validate_positions(slide_index.positions())
+        if self.slide_index is None:
+            changed = slide_index.articles()
+        else:
+            changed = slide_index.changed_articles(self.slide_index)
+            print(f"Excel файл изменен, затронуто артикулов: {len(changed)}")
+        self.slide_index = slide_index
+        self._excel_signature = signature
+        return changed
+
+    def _scan_folders(self):
+        """Scan photos_dir and get {relpath: (article, image_paths, signature, newest_mtime)}."""
+        folders = {}
+        for article, image_paths in scan_articles(self.photos_dir, max_depth=self.scan_depth):
+            signature = []
+            for path in image_paths:
+                try:
+                    signature.append((os.path.basename(path),) + self._file_signature(path))
+                except OSError:
+                    # Файл удален между листингом и stat — папка еще меняется
+                    continue
+            newest = max((mtime for _, _, mtime in signature), default=0) / 1e9
+            folders[article_relpath(self.photos_dir, image_paths)] = (
+                article, image_paths, tuple(signature), newest)
+        return folders
+
+    def poll(self):
+        """
+        Check for changes once and render the affected cards.
+        Returns the batch totals, or None if nothing changed.
+        """
+        start_time = time.perf_counter()
+        changed_articles = self._reload_excel()
+        folders = self._scan_folders()
+
+        now = time.time()
+        batch = []
+        for relpath, (article, image_paths, signature, newest) in folders.items():
+            if self._folders.get(relpath) == signature and article not in changed_articles:
+                continue
+            if now - newest < self.settle_time:
+                # Фото еще копируются — папка будет обработана на следующих проверках
+                continue
+            batch.append((relpath, article, image_paths, signature))
+
+        # Удаленные папки забываются, их результаты остаются на диске
+        for relpath in set(self._folders) - set(folders):
+            del self._folders[relpath]
+
+        if not batch:
+            return None
+
+        totals = self.render_batch([(article, image_paths) for _, article, image_paths, _ in batch])
+        # Папки с ошибками не запоминаются: их карточки повторяются на следующих проверках
+        for relpath, _, _, signature in batch:
+            if relpath not in totals["failed_folders"]:
+                self._folders[relpath] = signature
+        totals["articles"] = len(batch)
+        totals["elapsed"] = round(time.perf_counter() - start_time, 3)
+        return totals
+
+    def render_batch(self, articles):
+        """
+        Render the cards of the given (article, image_paths) folders whose inputs
+        changed (see BuildManifest). Returns the processed/failed/skipped totals and
+        the article folders (relative to photos_dir) that had failed cards.
+        """
+        plan = self.image_processor.plan_cards(
+            self.slide_index, self.photos_dir, self.infografika_dir, self.output_dir,
+            self.scan_depth, self.manifest, self.profile, self.output_sizes, self.size_subdirs,
+            self.variants, articles=articles
+        )
+        if self.pool is not None and plan.total > 1:
+            results = self.pool.imap(plan)
+        else:
+            results = (self.image_processor._render_card_safe(task) for task in plan)
+
+        processed = 0
+        failed = 0
+        failed_folders = set()
+        try:
+            for task, error in results:
+                if error:
+                    print(error)
+                    failed += 1
+                    failed_folders.add(article_relpath(self.photos_dir, [task.photo_path]))
+                    continue
+                processed += 1
+                for output in task.outputs:
+                    if output.path in plan.card_keys:
+                        self.manifest.record(output.path, plan.card_keys[output.path])
+        finally:
+            self.manifest.save()
+        return {"processed": processed, "failed": failed, "skipped": plan.skipped, "total": plan.total,
+                "failed_folders": sorted(failed_folders)}
+
+    def run(self, stop_event=None, on_batch=None, on_error=None):
+        """
+        Poll every interval seconds until stop_event is set.
+        on_batch(totals) is called after each rendered batch; errors of a single poll
+        are passed to on_error(message) (or printed) and watching continues.
+        """
+        if stop_event is None:
+            stop_event = threading.Event()
+        print(f"Слежение за {self.photos_dir} и {self.excel_file}, интервал {self.interval} с")
+        while not stop_event.is_set():
+            try:
+                totals = self.poll()
+                if totals is not None and on_batch is not None:
+                    on_batch(totals)
+            except Exception as e:
+                message = f"Ошибка при проверке изменений: {e}"
+                if on_error is not None:
+                    on_error(message)
+                else:
+                    print(message)
+            stop_event.wait(self.interval)
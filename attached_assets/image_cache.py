@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+from PIL import Image
+
+# Декодированная инфографика: RGBA изображение и заранее выделенный альфа-канал
+CachedOverlay = namedtuple("CachedOverlay", ["image", "mask"])
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU mapping with a fixed number of entries.
+    Not shared between processes: a pickled copy starts empty.
+    """
+
+    def __init__(self, max_items=64):
+        """Initialize with the maximum number of entries to keep."""
+        self.max_items = max(1, int(max_items))
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Get a value and mark it as most recently used."""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries if needed."""
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getstate__(self):
+        # Кэш не передается в процессы-воркеры: каждый заполняет свой
+        return {"max_items": self.max_items}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_items"])
+
+
+class OverlayCache(LRUCache):
+    """
+    Cache of decoded infographic PNGs keyed by path and modification time.
+    Each overlay is decoded and converted to RGBA once; the alpha band used
+    as the paste mask is extracted once as well.
+    """
+
+    def load(self, infografika_path):
+        """Get the CachedOverlay for a path, decoding it on a miss or after a change."""
+        key = (os.path.abspath(infografika_path), os.stat(infografika_path).st_mtime_ns)
+        overlay = self.get(key)
+        if overlay is None:
+            with Image.open(infografika_path) as infografika:
+                if infografika.mode != 'RGBA':
+                    image = infografika.convert('RGBA')
+                else:
+                    image = infografika.copy()
+            overlay = CachedOverlay(image, image.getchannel('A'))
+            self.put(key, overlay)
+        return overlay
+
+    def load_scaled(self, infografika_path, scale):
+        """
+        Get the CachedOverlay resized by scale (for proxy previews).
+        The scaled copy is cached separately from the full-size overlay.
+        """
+        if scale >= 1:
+            return self.load(infografika_path)
+        key = (os.path.abspath(infografika_path), os.stat(infografika_path).st_mtime_ns, scale)
+        overlay = self.get(key)
+        if overlay is None:
+            full = self.load(infografika_path).image
+            size = (max(1, round(full.width * scale)), max(1, round(full.height * scale)))
+            image = full.resize(size, Image.Resampling.LANCZOS)
+            overlay = CachedOverlay(image, image.getchannel('A'))
+            self.put(key, overlay)
+        return overlay
+
+
+class CanvasCache(LRUCache):
+    """
+    Cache of processed base canvases (photo resized and cropped to the canvas)
+    keyed by photo path, modification time and canvas size.
+    Cached canvases are shared: callers must copy them before drawing.
+    """
+
+    def load(self, photo_path, canvas_width, canvas_height, render):
+        """Get the base canvas for a photo, calling render(photo_path, w, h) on a miss."""
+        key = (os.path.abspath(photo_path), os.stat(photo_path).st_mtime_ns,
+               canvas_width, canvas_height)
+        canvas = self.get(key)
+        if canvas is None:
+            canvas = render(photo_path, canvas_width, canvas_height)
+            self.put(key, canvas)
+        return canvas
@@ -1,9 +1,61 @@
 import os
-import pandas as pd
-from PIL import Image, ImageOps
+import math
+from PIL import Image
 import time
 import shutil
 import sys
+from collections import namedtuple, Counter
+
+from attached_assets.slide_index import SlideIndex
+from attached_assets.image_cache import OverlayCache, CanvasCache
+from attached_assets.render_pool import RenderPool, resolve_workers
+from attached_assets.render_pipeline import RenderPipeline
+from attached_assets.memory_governor import create_budget, peak_rss_mb
+from attached_assets.build_manifest import BuildManifest
+from attached_assets.photo_scanner import scan_articles, article_relpath
+from attached_assets.work_plan import WorkPlan, ProgressReporter
+from attached_assets.output_profiles import get_profile, profile_for_sheets, profile_extension, save_image
+from attached_assets.marketplace_variants import parse_variants, variant_infografika_name
+from attached_assets.job_journal import JobJournal, find_unfinished_job
+
+# Версия логики отрисовки: входит в хэш карточки, увеличивается при изменении результата
+RENDER_VERSION = "2"
+
+# EXIF тег ориентации снимка и соответствующие ему преобразования
+EXIF_ORIENTATION = 0x0112
+EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Способы наложения инфографики (см. ImageProcessor.__init__)
+COMPOSITORS = ("pil", "numpy")
+
+# Режимы, которые PIL масштабирует напрямую (альфа учитывается при ресэмплинге)
+RESAMPLE_MODES = ('RGB', 'RGBA', 'L', 'LA', 'CMYK')
+
+# Сначала быстрое целочисленное уменьшение, затем точный ресэмплинг (см. Image.resize)
+RESIZE_REDUCING_GAP = 3.0
+
+# Один выходной файл карточки: размер холста, путь, вариант маркетплейса (или None)
+# и инфографика (sheet, name, path, position), которая накладывается в этом файле
+CardOutput = namedtuple("CardOutput", ["width", "height", "path", "variant", "overlays"])
+
+# Одна карточка: фото артикула, его выходные файлы (по одному на размер и вариант),
+# инфографика (sheet, name, path, position) из Excel для его слайда и профиль кодирования результата
+CardTask = namedtuple("CardTask", ["article", "img_file", "photo_path", "outputs", "overlays",
+                                   "output_profile"])
+
+
+def card_sizes(task):
+    """Get the distinct (width, height) canvas sizes of a card task, in output order."""
+    return list(dict.fromkeys((output.width, output.height) for output in task.outputs))
+
 
 class ImageProcessor:
     """
@@ -11,66 +63,267 @@ class ImageProcessor:
     and overlaying infographics.
     """
     
-    def __init__(self, config_manager):
-        """Initialize with a config manager."""
+    def __init__(self, config_manager, compositor=None):
+        """
+        Initialize with a config manager. compositor selects how overlays are
+        blended onto cards: "pil" (Image.paste) or "numpy" (see NumpyCompositor);
+        default: the "compositor" setting.
+        """
         self.config_manager = config_manager
+        cache_size = config_manager.get_settings().get("overlay_cache_size", 64)
+        self.overlay_cache = OverlayCache(max_items=cache_size)
+        if compositor is None:
+            compositor = config_manager.get_settings().get("compositor", "pil")
+        if compositor not in COMPOSITORS:
+            raise Exception(f"Неизвестный компоновщик {compositor}, доступны: {', '.join(COMPOSITORS)}")
+        self.compositor = None
+        if compositor == "numpy":
+            # NumPy загружается только для компоновщика numpy
+            from attached_assets.compositor import NumpyCompositor
+            self.compositor = NumpyCompositor(max_items=cache_size)
+        # Базовые холсты для предпросмотра; при пакетной обработке не используются
+        canvas_cache_size = config_manager.get_settings().get("canvas_cache_size", 8)
+        self.canvas_cache = CanvasCache(max_items=canvas_cache_size)
+        # Итоги последнего запуска generate_cards (для CLI и журналов)
+        self.last_run = None
+    
+    def draft_for_canvas(self, img, canvas_width, canvas_height):
+        """
+        Configures JPEG draft mode (DCT scaling) so the image is decoded at the
+        smallest 1/2, 1/4 or 1/8 scale that still covers the canvas after EXIF rotation.
+        Must be called before the image data is loaded; other formats are left as is.
+        """
+        if img.format != 'JPEG':
+            return
+        
+        width, height = img.size
+        # Ориентации 5-8 меняют местами ширину и высоту
+        rotated = img.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8)
+        if rotated:
+            width, height = height, width
+        
+        scale = max(canvas_width / width, canvas_height / height)
+        if scale >= 1:
+            return
+        
+        required_width = math.ceil(width * scale)
+        required_height = math.ceil(height * scale)
+        if rotated:
+            required_width, required_height = required_height, required_width
+        img.draft(img.mode, (required_width, required_height))
     
     def process_and_center_image(self, photo_path, canvas_width, canvas_height):
         """
         Processes an image: removes Exif, resizes, centers, and crops excess.
         Returns a new canvas with the processed image.
+        Only the source region that survives the center crop is resampled, straight
+        to the canvas size, in a single resize; EXIF rotation is applied to the
+        canvas-sized result. Images with alpha are flattened onto white.
+        """
+        return self.process_and_center_images(photo_path, [(canvas_width, canvas_height)])[0]
+    
+    def process_and_center_images(self, photo_path, sizes):
+        """
+        Processes an image into canvases of several sizes from a single decode.
+        Returns the canvases in the order of sizes. Sizes are rendered from the
+        largest down; a size is cropped and downscaled from an already rendered
+        larger canvas when that canvas contains its whole crop region at no lower
+        pixel density and was not upscaled from a smaller photo. Other sizes are
+        cropped from the decoded photo directly.
         """
         try:
-            with Image.open(photo_path) as img:
-                img = ImageOps.exif_transpose(img)
-                
-                # Scale to fill canvas
-                scale = max(canvas_width / img.width, canvas_height / img.height)
-                img = img.resize((int(img.width * scale), int(img.height * scale)))
-                
-                # Center crop
-                left = (img.width - canvas_width) // 2
-                top = (img.height - canvas_height) // 2
-                img = img.crop((left, top, left + canvas_width, top + canvas_height))
-                
-                # Create canvas
-                canvas = Image.new('RGB', (canvas_width, canvas_height), 'white')
-                canvas.paste(img, (0, 0))
-                
-                return canvas
+            return self.canvases_from_source(self.load_source(photo_path, sizes), sizes)
         except Exception as e:
             raise Exception(f"Ошибка обработки изображения {photo_path}: {e}")
     
+    def load_source(self, photo_path, sizes):
+        """
+        Decode a photo for the given canvas sizes (the I/O and decode half of
+        process_and_center_images). Returns (image, transpose): the fully loaded
+        image in a resampleable mode and its pending EXIF transpose.
+        """
+        img = Image.open(photo_path)
+        try:
+            # JPEG декодируется сразу в уменьшенном масштабе, если он покрывает все холсты
+            self.draft_for_canvas(img, max(width for width, _ in sizes),
+                                  max(height for _, height in sizes))
+            transpose = EXIF_TRANSPOSE.get(img.getexif().get(EXIF_ORIENTATION, 1))
+            img.load()
+            return self._resizable(img), transpose
+        finally:
+            # После load() файл уже не нужен: данные изображения в памяти
+            if img.fp is not None:
+                img.fp.close()
+    
+    def load_card_source(self, task):
+        """Decode the photo of a card task for all its output sizes (see load_source)."""
+        return self.load_source(task.photo_path, card_sizes(task))
+    
+    def canvases_from_source(self, source, sizes):
+        """
+        Render the canvases of all sizes from a source loaded by load_source().
+        Returns the canvases in the order of sizes.
+        """
+        img, transpose = source
+        
+        # Размеры снимка после поворота по EXIF
+        source_size = img.size
+        if transpose in (Image.Transpose.TRANSPOSE, Image.Transpose.TRANSVERSE,
+                         Image.Transpose.ROTATE_90, Image.Transpose.ROTATE_270):
+            source_size = (img.height, img.width)
+        
+        canvases = {}
+        regions = {}
+        sharp_sizes = []  # холсты, полученные без увеличения исходника
+        for size in sorted(set(sizes), key=lambda size: size[0] * size[1], reverse=True):
+            regions[size] = self._crop_region(source_size, *size)
+            base = next((base for base in sharp_sizes
+                         if self._region_covers(regions[base], regions[size])), None)
+            if base is not None:
+                canvases[size], _ = self._fit_to_canvas(canvases[base], None, *size)
+                continue
+            canvases[size], upscaled = self._fit_to_canvas(img, transpose, *size)
+            if not upscaled:
+                sharp_sizes.append(size)
+        return [canvases[size] for size in sizes]
+    
+    def _crop_region(self, source_size, canvas_width, canvas_height):
+        """Get (crop_width, crop_height, density) of the centered crop that fills a canvas."""
+        source_width, source_height = source_size
+        scale = max(canvas_width / source_width, canvas_height / source_height)
+        return canvas_width / scale, canvas_height / scale, scale
+    
+    def _region_covers(self, base_region, region):
+        """Check whether a canvas with base_region can be cropped and downscaled into region."""
+        base_width, base_height, base_density = base_region
+        width, height, density = region
+        # Допуск на погрешность округления при сравнении областей
+        return (width <= base_width + 1e-6 and height <= base_height + 1e-6
+                and density <= base_density + 1e-9)
+    
+    def _fit_to_canvas(self, img, transpose, canvas_width, canvas_height):
+        """
+        Scale a decoded photo to fill the canvas and center crop it in one resample.
+        Returns (canvas, upscaled) where upscaled tells whether the photo was enlarged.
+        """
+        # Центрированная обрезка симметрична относительно поворотов и отражений,
+        # поэтому ее можно посчитать в координатах исходного (не повернутого) снимка
+        target_width, target_height = canvas_width, canvas_height
+        if transpose in (Image.Transpose.TRANSPOSE, Image.Transpose.TRANSVERSE,
+                         Image.Transpose.ROTATE_90, Image.Transpose.ROTATE_270):
+            target_width, target_height = canvas_height, canvas_width
+        
+        # Scale to fill canvas and center crop in one resample
+        scale = max(target_width / img.width, target_height / img.height)
+        # min() убирает погрешность округления, иначе смещение рамки может стать отрицательным
+        crop_width = min(img.width, target_width / scale)
+        crop_height = min(img.height, target_height / scale)
+        left = (img.width - crop_width) / 2
+        top = (img.height - crop_height) / 2
+        canvas = img.resize(
+            (target_width, target_height),
+            box=(left, top, left + crop_width, top + crop_height),
+            reducing_gap=RESIZE_REDUCING_GAP
+        )
+        
+        if transpose is not None:
+            canvas = canvas.transpose(transpose)
+        
+        canvas = self._flatten_to_rgb(canvas)
+        # Метаданные исходника (EXIF, ICC) в карточку не переносятся
+        canvas.info = {}
+        return canvas, scale > 1
+    
+    def _resizable(self, img):
+        """Convert modes that cannot be resampled smoothly (palette, bilevel, 16-bit, ...)."""
+        if img.mode in RESAMPLE_MODES:
+            return img
+        if img.mode == 'P' and 'transparency' in img.info:
+            return img.convert('RGBA')
+        if img.mode == '1':
+            return img.convert('L')
+        return img.convert('RGB')
+    
+    def _flatten_to_rgb(self, canvas):
+        """Convert a canvas-sized image to RGB; transparent areas become white."""
+        if canvas.mode == 'RGB':
+            return canvas
+        if canvas.mode in ('RGBA', 'LA'):
+            flattened = Image.new('RGB', canvas.size, 'white')
+            flattened.paste(canvas.convert('RGB'), (0, 0), canvas.getchannel('A'))
+            return flattened
+        return canvas.convert('RGB')
+    
+    def get_base_canvas(self, photo_path, canvas_width, canvas_height):
+        """
+        Get a copy of the processed canvas for a photo from the canvas cache.
+        Repeated previews of the same photo only re-composite the overlays.
+        """
+        canvas = self.canvas_cache.load(photo_path, canvas_width, canvas_height,
+                                        self.process_and_center_image)
+        return canvas.copy()
+    
+    def proxy_scale(self, canvas_width, canvas_height, display_width, display_height):
+        """Get the scale at which a canvas fits the display size (never above 1)."""
+        return min(display_width / canvas_width, display_height / canvas_height, 1.0)
+    
+    def render_proxy(self, photo_path, overlays, canvas_width, canvas_height,
+                     display_width, display_height):
+        """
+        Renders a preview directly at display resolution.
+        overlays is a list of (infografika_path, position). The photo is decoded and
+        cropped straight to the proxy size and overlays are pasted from scaled copies;
+        positions come from the same formulas evaluated for the full canvas and are
+        then scaled, so the proxy matches the full render up to resampling.
+        """
+        scale = self.proxy_scale(canvas_width, canvas_height, display_width, display_height)
+        proxy_width = max(1, round(canvas_width * scale))
+        proxy_height = max(1, round(canvas_height * scale))
+        canvas = self.get_base_canvas(photo_path, proxy_width, proxy_height)
+        
+        margin = self.config_manager.get_settings().get("margin", 30)
+        for infografika_path, position in overlays:
+            try:
+                # Позиция считается для полного холста и полного размера инфографики
+                full = self.overlay_cache.load(infografika_path).image
+                x_offset, y_offset = self.config_manager.calculate_position(
+                    position, canvas_width, canvas_height, full.width, full.height, margin
+                )
+                infografika, mask = self.overlay_cache.load_scaled(infografika_path, scale)
+                canvas.paste(infografika, (round(x_offset * scale), round(y_offset * scale)), mask)
+            except Exception as e:
+                raise Exception(f"Ошибка наложения инфографики {infografika_path}: {e}")
+        return canvas
+    
     def overlay_infografika(self, canvas, infografika_path, position):
         """
         Overlays an infographic onto the canvas at the specified position.
         Returns the modified canvas.
         """
         try:
-            with Image.open(infografika_path) as infografika:
-                if infografika.mode != 'RGBA':
-                    infografika = infografika.convert('RGBA')
-                
-                # Get canvas dimensions
-                canvas_width, canvas_height = canvas.size
-                
-                # Get settings
-                settings = self.config_manager.get_settings()
-                margin = settings.get("margin", 30)
-                
-                # Calculate position
-                x_offset, y_offset = self.config_manager.calculate_position(
-                    position, 
-                    canvas_width, 
-                    canvas_height, 
-                    infografika.width, 
-                    infografika.height,
-                    margin
-                )
-                
-                # Paste infographic onto canvas
-                canvas.paste(infografika, (x_offset, y_offset), infografika)
-                return canvas
+            # Декодированная RGBA инфографика и ее альфа-канал берутся из кэша
+            infografika, mask = self.overlay_cache.load(infografika_path)
+            
+            # Get canvas dimensions
+            canvas_width, canvas_height = canvas.size
+            
+            # Get settings
+            settings = self.config_manager.get_settings()
+            margin = settings.get("margin", 30)
+            
+            # Calculate position
+            x_offset, y_offset = self.config_manager.calculate_position(
+                position, 
+                canvas_width, 
+                canvas_height, 
+                infografika.width, 
+                infografika.height,
+                margin
+            )
+            
+            # Paste infographic onto canvas
+            canvas.paste(infografika, (x_offset, y_offset), mask)
+            return canvas
         except Exception as e:
             raise Exception(f"Ошибка наложения инфографики {infografika_path}: {e}")
     
@@ -91,126 +344,465 @@ class ImageProcessor:
                 return indexed_dir
             counter += 1
     
+    def render_card(self, task):
+        """
+        Renders a single card task: processes the photo once into all output sizes,
+        overlays the infographics of each output (size and marketplace variant) on
+        a copy of the base canvas of its size and saves the results.
+        Raises on processing/saving errors.
+        """
+        self.save_card(task, self.compose_card(task))
+    
+    def compose_card(self, task, source=None):
+        """
+        Composite all outputs of a card task without saving them.
+        source is the photo already decoded by load_source() (decoded here if None).
+        Returns a list of (output, canvas).
+        """
+        sizes = card_sizes(task)
+        try:
+            if source is None:
+                source = self.load_source(task.photo_path, sizes)
+            bases = dict(zip(sizes, self.canvases_from_source(source, sizes)))
+        except Exception as e:
+            raise Exception(f"Ошибка обработки изображения {task.photo_path}: {e}")
+        
+        # Базовый холст копируется для каждого варианта, последний получает оригинал
+        composed = []
+        remaining = Counter((output.width, output.height) for output in task.outputs)
+        for output in task.outputs:
+            size = (output.width, output.height)
+            remaining[size] -= 1
+            canvas = bases[size] if remaining[size] == 0 else bases[size].copy()
+            
+            if self.compositor is not None and self.compositor.supports(canvas):
+                composed.append((output, self.composite_overlays(task, canvas, output.overlays)))
+                continue
+            
+            # Для каждого листа Excel добавляем инфографику из задачи
+            for sheet_name, infografika_name, infografika_path, position in output.overlays:
+                try:
+                    canvas = self.overlay_infografika(canvas, infografika_path, position)
+                    print(f"Добавлена инфографика {infografika_name} на позицию {position} из листа {sheet_name} для изображения {task.img_file} артикула {task.article}")
+                except Exception as e:
+                    print(f"Ошибка при обработке листа {sheet_name} для артикула {task.article}, изображения {task.img_file}: {e}")
+            composed.append((output, canvas))
+        return composed
+    
+    def composite_overlays(self, task, canvas, overlays):
+        """
+        Blend the (sheet, name, path, position) overlays of one output onto its
+        canvas with the NumPy compositor (see NumpyCompositor). Returns the canvas.
+        """
+        margin = self.config_manager.get_settings().get("margin", 30)
+        canvas_width, canvas_height = canvas.size
+        placements = []
+        for sheet_name, infografika_name, infografika_path, position in overlays:
+            try:
+                overlay = self.compositor.load(infografika_path, canvas.mode, self.overlay_cache)
+                x_offset, y_offset = self.config_manager.calculate_position(
+                    position, canvas_width, canvas_height, overlay.width, overlay.height, margin
+                )
+                placements.append((overlay, x_offset, y_offset))
+                print(f"Добавлена инфографика {infografika_name} на позицию {position} из листа {sheet_name} для изображения {task.img_file} артикула {task.article}")
+            except Exception as e:
+                print(f"Ошибка при обработке листа {sheet_name} для артикула {task.article}, изображения {task.img_file}: "
+                      f"Ошибка наложения инфографики {infografika_path}: {e}")
+        return self.compositor.composite(canvas, placements)
+    
+    def save_card(self, task, composed):
+        """Encode and save the (output, canvas) pairs returned by compose_card()."""
+        for output, canvas in composed:
+            try:
+                save_image(canvas, output.path, task.output_profile)
+            except Exception as e:
+                raise Exception(f"Ошибка сохранения результата {output.path}: {e}")
+    
+    def _render_card_safe(self, task):
+        """Render a card task in-process. Returns (task, error message or None)."""
+        try:
+            self.render_card(task)
+            return task, None
+        except Exception as e:
+            return task, str(e)
+    
+    def iter_cards(self, slide_index, photos_dir, infografika_dir, output_dir, scan_depth=1,
+                   output_profile=None, output_sizes=None, size_subdirs=False, variants=None,
+                   articles=None):
+        """
+        Lazily yields card tasks, one per (article, photo), as article folders are discovered.
+        Creates the per-article output directories, mirroring the layout under photos_dir.
+        Each card is encoded with its sheet's profile or output_profile (see output_profiles).
+        output_sizes lists the (width, height) canvases of every card (default: the canvas
+        size from settings); with size_subdirs each size goes to its own "WxH" folder.
+        With marketplace variants (e.g. ["WB", "OZON"]) every card gets one output per
+        variant in "<variant>/", with the infographic suffixes swapped to that variant.
+        articles is an optional list of (article, image_paths) to use instead of scanning.
+        """
+        settings = self.config_manager.get_settings()
+        if output_profile is None:
+            output_profile = get_profile(settings)
+        if not output_sizes:
+            output_sizes = [(settings.get("canvas_width", 900), settings.get("canvas_height", 1200))]
+        variants = list(variants or [])
+        
+        if articles is None:
+            articles = scan_articles(photos_dir, max_depth=scan_depth)
+        
+        found_articles = False
+        for article, image_paths in articles:
+            found_articles = True
+            
+            # Создаем директорию для вывода для этого артикула (для каждого варианта и размера)
+            relpath = article_relpath(photos_dir, image_paths)
+            article_output_dirs = []
+            for variant in variants or [None]:
+                variant_dir = os.path.join(output_dir, variant) if variant else output_dir
+                for width, height in output_sizes:
+                    if size_subdirs:
+                        article_output_dir = os.path.join(variant_dir, f"{width}x{height}", relpath)
+                    else:
+                        article_output_dir = os.path.join(variant_dir, relpath)
+                    os.makedirs(article_output_dir, exist_ok=True)
+                    article_output_dirs.append((variant, width, height, article_output_dir))
+            
+            # Файлы уже отсортированы по имени: индекс файла совпадает с номером слайда
+            for img_idx, photo_path in enumerate(image_paths):
+                yield self.card_task(slide_index, article, img_idx, photo_path, infografika_dir,
+                                     article_output_dirs, variants, output_profile)
+        
+        if not found_articles:
+            raise Exception(f"Не найдены директории артикулов в {photos_dir}")
+    
+    def card_task(self, slide_index, article, slide_idx, photo_path, infografika_dir,
+                  output_dirs, variants=None, output_profile=None):
+        """
+        Build the CardTask of one photo (slide_idx is its index in the article folder).
+        output_dirs lists (variant, width, height, directory) of the outputs to write;
+        variants is the full list of marketplace variants used to swap infographic names.
+        """
+        settings = self.config_manager.get_settings()
+        if output_profile is None:
+            output_profile = get_profile(settings)
+        variants = list(variants or [])
+        
+        img_file = os.path.basename(photo_path)
+        entries = slide_index.get(article, slide_idx)
+        overlays = self._resolve_overlays(entries, infografika_dir)
+        
+        # Набор инфографики для каждого варианта маркетплейса
+        variant_overlays = {None: overlays}
+        for variant in {output_dir[0] for output_dir in output_dirs} - {None}:
+            variant_overlays[variant] = self._resolve_overlays(
+                entries, infografika_dir,
+                lambda name, variant=variant: variant_infografika_name(name, variant, variants)
+            )
+        
+        profile = profile_for_sheets(settings, [overlay[0] for overlay in overlays], output_profile)
+        output_name = os.path.splitext(img_file)[0] + profile_extension(profile)
+        return CardTask(
+            article=article,
+            img_file=img_file,
+            photo_path=photo_path,
+            outputs=tuple(
+                CardOutput(width, height, os.path.join(output_dir, output_name),
+                           variant, variant_overlays[variant])
+                for variant, width, height, output_dir in output_dirs
+            ),
+            overlays=overlays,
+            output_profile=profile
+        )
+    
+    def _resolve_overlays(self, entries, infografika_dir, rename=None):
+        """
+        Turn (sheet, infografika_name, position) entries into (sheet, name, path, position)
+        overlays, optionally renaming the infographics first. Missing files are skipped.
+        """
+        overlays = []
+        for sheet_name, infografika_name, position in entries:
+            if rename is not None:
+                infografika_name = rename(infografika_name)
+            # Если файл инфографики существует, добавляем его в задачу
+            infografika_path = os.path.join(infografika_dir, infografika_name + ".png")
+            if os.path.exists(infografika_path):
+                overlays.append((sheet_name, infografika_name, infografika_path, position))
+        return tuple(overlays)
+    
     def generate_cards(self, excel_file, photos_dir, infografika_dir, output_dir, 
-                       canvas_width, canvas_height, margin, progress_callback=None):
+                       canvas_width, canvas_height, margin, progress_callback=None,
+                       slide_index=None, workers=1, incremental=False, scan_depth=1,
+                       progress_max_rate=None, output_profile=None, output_sizes=None,
+                       variants=None, resume=False, job_control=None, pipeline_depth=None,
+                       memory_budget_mb=None):
         """
         Processes all photos based on data from all sheets in Excel file.
         Each sheet is processed separately but with the same logic.
+        The workbook is parsed once into a SlideIndex; a prebuilt index may be passed in.
+        With workers > 1 (or 0 for all cores) cards are rendered in a process pool.
+        With incremental=True output_dir is reused as is and only cards whose
+        inputs changed since the previous run (see BuildManifest) are rendered.
+        Article folders are scanned up to scan_depth levels into a WorkPlan before
+        rendering; progress is reported from a counter, throttled to
+        progress_max_rate updates per second (None = every card).
+        output_profile names the encoding profile for the run (default: the
+        "output_profile" setting); "sheet_output_profiles" can override it per sheet.
+        output_sizes is a list of (width, height): every card is then rendered in all
+        these sizes from one decode, each size in its own "WxH" subfolder; by default
+        only canvas_width x canvas_height is rendered, straight into output_dir.
+        variants lists marketplace variants (e.g. ["WB", "OZON"]): the base canvas of a
+        card is prepared once and each variant's infographic set (see
+        marketplace_variants) is composited on a copy into output_dir/<variant>/.
+        Completed cards are appended to a JobJournal in the output directory, which is
+        removed once the job finishes without failures. With resume=True the latest
+        unfinished job for output_dir is continued in its directory, skipping the cards
+        it completed. A JobControl can pause or cancel the job between cards.
+        A single-process run goes through a RenderPipeline (photo decoding and card
+        saving overlap with compositing) with pipeline_depth cards per queue
+        (default: the "pipeline_depth" setting; 0 renders strictly one card at a time);
+        its stage stats are added to self.last_run["pipeline"].
+        memory_budget_mb (default: the "memory_budget_mb" setting, 0 = no limit) caps
+        the estimated memory of the cards in flight (see memory_governor); the budget
+        use and the peak RSS of the process and its workers go to self.last_run["memory"].
+        Run totals (processed, failed, skipped, cancelled, output_dir, elapsed) are kept
+        in self.last_run.
         """
-        allowed_extensions = ['.png', '.jpg', '.jpeg', '.bmp']
+        start_time = time.perf_counter()
+        resume_dir = find_unfinished_job(output_dir) if resume else None
+        if resume and resume_dir is None:
+            print(f"Прерванная обработка для {output_dir} не найдена, начинаем заново")
         
-        # Создаем новую выходную директорию с индексом, если она уже существует
-        original_output_dir = output_dir
-        output_dir_index = 1
-        while os.path.exists(output_dir):
-            output_dir = f"{original_output_dir}_{output_dir_index}"
-            output_dir_index += 1
+        if resume_dir is not None:
+            # Продолжаем прерванное задание в его директории
+            output_dir = resume_dir
+            print(f"Продолжение прерванной обработки в директории: {output_dir}")
+        elif incremental:
+            # Стабильная выходная директория для инкрементальной сборки
+            os.makedirs(output_dir, exist_ok=True)
+            print(f"Инкрементальная сборка в директорию: {output_dir}")
+        else:
+            # Создаем новую выходную директорию с индексом, если она уже существует
+            original_output_dir = output_dir
+            output_dir_index = 1
+            while os.path.exists(output_dir):
+                output_dir = f"{original_output_dir}_{output_dir_index}"
+                output_dir_index += 1
+            
+            # Создаем выходную директорию
+            os.makedirs(output_dir, exist_ok=True)
+            print(f"Создана директория для результатов: {output_dir}")
         
-        # Создаем выходную директорию
-        os.makedirs(output_dir, exist_ok=True)
-        print(f"Создана директория для результатов: {output_dir}")
+        # Читаем все листы из Excel файла один раз
+        if slide_index is None:
+            slide_index = SlideIndex.from_excel(excel_file)
+        sheet_names = slide_index.sheet_names
+        print(f"Найдено {len(sheet_names)} листов в файле: {', '.join(sheet_names)}")
         
-        # Читаем все листы из Excel файла
-        try:
-            xl = pd.ExcelFile(excel_file)
-            sheet_names = xl.sheet_names
-            print(f"Найдено {len(sheet_names)} листов в файле: {', '.join(sheet_names)}")
-        except Exception as e:
-            raise Exception(f"Ошибка чтения Excel файла: {str(e)}")
+        # Некорректные формулы используемых позиций — ошибка до начала обработки
+        self.config_manager.validate_positions(slide_index.positions())
         
-        # Получаем список директорий артикулов
-        all_articles = [d for d in os.listdir(photos_dir) if os.path.isdir(os.path.join(photos_dir, d))]
-        if not all_articles:
-            raise Exception(f"Не найдены директории артикулов в {photos_dir}")
+        profile = get_profile(self.config_manager.get_settings(), output_profile)
+        print(f"Профиль вывода: {profile['name']}")
         
-        total_processed = 0
+        output_sizes, size_subdirs = self.resolve_output_sizes(output_sizes, canvas_width, canvas_height)
         
-        # Для каждого артикула
-        for article_idx, article in enumerate(all_articles):
-            article_dir = os.path.join(photos_dir, article)
-            
-            # Получаем список файлов изображений в директории артикула
-            image_files = [f for f in os.listdir(article_dir) 
-                          if os.path.isfile(os.path.join(article_dir, f)) and 
-                          f.lower().endswith(tuple(allowed_extensions))]
-            
-            # Сортируем файлы по имени для обеспечения последовательности
-            image_files.sort()
-            
-            # Создаем директорию для вывода для этого артикула
-            article_output_dir = os.path.join(output_dir, article)
-            os.makedirs(article_output_dir, exist_ok=True)
-            
-            # Обрабатываем каждое изображение
-            for img_idx, img_file in enumerate(image_files):
-                photo_path = os.path.join(article_dir, img_file)
-                output_path = os.path.join(article_output_dir, os.path.splitext(img_file)[0] + ".png")
-                
-                # Создаем canvas для изображения
-                try:
-                    canvas = self.process_and_center_image(photo_path, canvas_width, canvas_height)
-                except Exception as e:
-                    print(f"Ошибка обработки изображения {photo_path}: {e}")
-                    continue
-                
-                # Для каждого листа Excel проверяем, нужно ли добавить инфографику
-                added_infografika = False
-                
-                for sheet_name in sheet_names:
-                    try:
-                        # Читаем данные текущего листа
-                        df = pd.read_excel(excel_file, sheet_name=sheet_name, dtype=str).fillna('')
-                        data = df.values.tolist()
-                        
-                        # Создаем словарь артикул -> данные
-                        articles_in_excel = {row[0]: row[1:] for row in data if row[0]}
-                        
-                        # Проверяем, есть ли этот артикул в данных листа
-                        if article in articles_in_excel:
-                            slides_data = articles_in_excel[article]
-                            
-                            # Проверяем, есть ли данные для этого изображения
-                            if img_idx < len(slides_data) // 2:
-                                infografika_name = slides_data[2 * img_idx]
-                                position_str = slides_data[2 * img_idx + 1]
-                                
-                                if infografika_name and position_str:
-                                    # Путь к файлу инфографики
-                                    infografika_path = os.path.join(infografika_dir, infografika_name + ".png")
-                                    position = int(position_str)
-                                    
-                                    # Если файл существует, добавляем инфографику на изображение
-                                    if os.path.exists(infografika_path):
-                                        canvas = self.overlay_infografika(canvas, infografika_path, position)
-                                        added_infografika = True
-                                        print(f"Добавлена инфографика {infografika_name} на позицию {position} из листа {sheet_name} для изображения {img_file} артикула {article}")
-                    
-                    except Exception as e:
-                        print(f"Ошибка при обработке листа {sheet_name} для артикула {article}, изображения {img_file}: {e}")
-                
-                # Сохраняем результат
-                try:
-                    canvas.save(output_path)
+        variants = parse_variants(variants)
+        if variants:
+            print(f"Варианты маркетплейсов: {', '.join(variants)}")
+        
+        # Журнал задания: без resume записи прошлого запуска в этой директории не учитываются;
+        # файл журнала открывается только после успешного планирования
+        journal = JobJournal(output_dir, resume=resume_dir is not None)
+        
+        manifest = BuildManifest(output_dir) if incremental else None
+        plan = self.plan_cards(slide_index, photos_dir, infografika_dir, output_dir,
+                               scan_depth, manifest, profile, output_sizes, size_subdirs, variants,
+                               journal)
+        if manifest is not None or resume_dir is not None:
+            print(f"Без изменений: {plan.skipped}, к обработке: {plan.total}")
+        
+        # Пауза и отмена проверяются перед выдачей каждой следующей карточки
+        tasks = plan if job_control is None else self._controlled_tasks(plan, job_control)
+        workers = resolve_workers(workers)
+        settings = self.config_manager.get_settings()
+        if pipeline_depth is None:
+            pipeline_depth = settings.get("pipeline_depth", 4)
+        if memory_budget_mb is None:
+            memory_budget_mb = settings.get("memory_budget_mb", 0)
+        memory_budget = create_budget(memory_budget_mb, workers)
+        if memory_budget is not None:
+            print(f"Бюджет памяти на карточки: {memory_budget.budget // (1024 * 1024)} МБ")
+        pool = None
+        pipeline = None
+        if workers > 1 and plan.total > 1:
+            print(f"Параллельная обработка: {min(workers, plan.total)} процессов")
+            pool = RenderPool(self, workers, memory_budget)
+            results = pool.imap(tasks)
+        elif pipeline_depth > 0 and plan.total > 1:
+            # Чтение следующих фото и запись готовых карточек идут параллельно с отрисовкой
+            pipeline = RenderPipeline(self, pipeline_depth, memory_budget)
+            results = pipeline.imap(tasks)
+        else:
+            results = (self._render_card_safe(task) for task in tasks)
+        
+        # Прогресс считается счетчиком по заранее известному общему числу карточек
+        progress = ProgressReporter(progress_callback, plan.total, progress_max_rate)
+        total_processed = 0
+        total_failed = 0
+        finished = False
+        cancelled = False
+        try:
+            journal.start({
+                "version": RENDER_VERSION,
+                "photos_dir": os.path.abspath(photos_dir),
+                "sizes": [list(size) for size in output_sizes],
+                "variants": variants,
+                "margin": margin,
+                "profile": profile["name"],
+            })
+            for task, error in results:
+                if error:
+                    print(error)
+                    total_failed += 1
+                else:
                     total_processed += 1
-                    
-                    # Обновляем прогресс (общий прогресс по всем артикулам и изображениям)
-                    if progress_callback:
-                        total_items = sum(
-                            len([f for f in os.listdir(os.path.join(photos_dir, a)) 
-                                if os.path.isfile(os.path.join(photos_dir, a, f)) and 
-                                f.lower().endswith(tuple(allowed_extensions))])
-                            for a in all_articles
-                        )
-                        current_item = sum(
-                            len([f for f in os.listdir(os.path.join(photos_dir, a)) 
-                                if os.path.isfile(os.path.join(photos_dir, a, f)) and 
-                                f.lower().endswith(tuple(allowed_extensions))])
-                            for a in all_articles[:article_idx]
-                        ) + img_idx + 1
-                        
-                        progress_callback(current_item, total_items)
-                    
-                except Exception as e:
-                    print(f"Ошибка сохранения результата {output_path}: {e}")
+                    journal.record([output.path for output in task.outputs])
+                    if manifest is not None:
+                        for output in task.outputs:
+                            if output.path in plan.card_keys:
+                                manifest.record(output.path, plan.card_keys[output.path])
+                progress.advance()
+            # Отмена после последней карточки не прерывает задание: все карточки уже готовы
+            finished = total_processed == plan.total
+            cancelled = job_control is not None and job_control.cancelled and not finished
+            if cancelled:
+                print(f"Обработка отменена: готово {total_processed} из {plan.total}")
+        finally:
+            # Журнал и манифест сохраняются и при прерывании, чтобы не терять готовые карточки;
+            # журнал остается, пока задание не завершено без ошибок и в нем есть готовые карточки
+            journal.close(finished)
+            if manifest is not None:
+                manifest.save()
+            self.last_run = {
+                "processed": total_processed,
+                "failed": total_failed,
+                "skipped": plan.skipped,
+                "total": plan.total,
+                "cancelled": cancelled,
+                "output_dir": output_dir,
+                "elapsed": round(time.perf_counter() - start_time, 3),
+            }
+            # Пик воркеров — только если в этом запуске работал пул процессов
+            memory = {"peak_rss_mb": peak_rss_mb(pool.worker_peak_rss if pool is not None else None)}
+            if memory_budget is not None:
+                memory.update(memory_budget.summary())
+            self.last_run["memory"] = memory
+            peak = memory["peak_rss_mb"]
+            if peak is not None:
+                print(f"Пиковый RSS: основной процесс {peak['main']} МБ"
+                      + (f", воркер {peak['worker']} МБ" if "worker" in peak else ""))
+            if pipeline is not None and pipeline.stats is not None:
+                self.last_run["pipeline"] = pipeline.stats
+                print(f"Конвейер: узкое место — {pipeline.stats['bottleneck']}, " + ", ".join(
+                    f"{name} {pipeline.stats[name]['utilization']:.0%}"
+                    for name in ("reader", "renderer", "writer")))
         
         return total_processed, output_dir  # Возвращаем также путь к выходной директории
+    
+    def resolve_output_sizes(self, output_sizes, canvas_width, canvas_height):
+        """
+        Normalize the output sizes of a run. Returns (sizes, size_subdirs): several
+        sizes go to their own "WxH" subfolders, the single canvas size straight to output_dir.
+        """
+        if not output_sizes:
+            return [(canvas_width, canvas_height)], False
+        output_sizes = list(dict.fromkeys((int(width), int(height)) for width, height in output_sizes))
+        print(f"Размеры вывода: {', '.join(f'{width}x{height}' for width, height in output_sizes)}")
+        return output_sizes, True
+    
+    def _controlled_tasks(self, tasks, job_control):
+        """Yield tasks one by one, waiting while the job is paused and stopping on cancel."""
+        for task in tasks:
+            if not job_control.wait():
+                return
+            yield task
+    
+    def plan_cards(self, slide_index, photos_dir, infografika_dir, output_dir, scan_depth=1,
+                   manifest=None, output_profile=None, output_sizes=None, size_subdirs=False,
+                   variants=None, journal=None, articles=None):
+        """
+        Scans the photo tree once and returns a frozen WorkPlan.
+        With a BuildManifest, cards whose inputs are unchanged are left out of the plan;
+        with a JobJournal, so are the outputs completed by an interrupted run.
+        """
+        tasks = self.iter_cards(slide_index, photos_dir, infografika_dir, output_dir, scan_depth,
+                                output_profile, output_sizes, size_subdirs, variants, articles)
+        resumed = 0
+        if journal is not None and journal.completed:
+            tasks, resumed = self._select_unfinished_cards(journal, tasks)
+        if manifest is None:
+            return WorkPlan(tasks, skipped=resumed)
+        plan = self._select_changed_cards(manifest, tasks)
+        plan.skipped += resumed
+        return plan
+    
+    def _select_unfinished_cards(self, journal, tasks):
+        """
+        Leave out the outputs recorded in the journal of an interrupted run.
+        Returns the remaining tasks and the number of fully completed cards.
+        """
+        unfinished = []
+        completed = 0
+        for task in tasks:
+            outputs = tuple(output for output in task.outputs if not journal.is_done(output.path))
+            if not outputs:
+                completed += 1
+            else:
+                unfinished.append(task._replace(outputs=outputs))
+        return unfinished, completed
+    
+    def output_key(self, manifest, task, output, positions=None):
+        """
+        Get the input hash of one card output: source photo, its overlays and their
+        positions, canvas size, margin, encoding profile and render version.
+        """
+        if positions is None:
+            positions = self.config_manager.get_positions()
+        margin = self.config_manager.get_settings().get("margin", 30)
+        overlays = [(infografika_path, position)
+                    for _, _, infografika_path, position in output.overlays]
+        return manifest.card_key(
+            task.photo_path, overlays, positions,
+            [RENDER_VERSION, output.width, output.height, margin, task.output_profile]
+        )
+    
+    def _select_changed_cards(self, manifest, tasks):
+        """
+        Leave out the cards whose inputs are unchanged since the last incremental run.
+        A card is kept with only its outdated outputs (sizes and variants).
+        Returns a WorkPlan with the input hashes of the outputs to render.
+        """
+        positions = self.config_manager.get_positions()
+        
+        changed = []
+        card_keys = {}
+        skipped = 0
+        for task in tasks:
+            outdated = []
+            try:
+                for output in task.outputs:
+                    key = self.output_key(manifest, task, output, positions)
+                    if not manifest.is_current(output.path, key):
+                        outdated.append(output)
+                        card_keys[output.path] = key
+            except Exception as e:
+                # Не удалось посчитать хэш — карточка перерисовывается без записи в манифест
+                print(f"Ошибка вычисления хэша для {task.photo_path}: {e}")
+                changed.append(task)
+                continue
+            
+            if not outdated:
+                skipped += 1
+                continue
+            changed.append(task._replace(outputs=tuple(outdated)))
+        
+        return WorkPlan(changed, card_keys, skipped)
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import threading
+
+JOURNAL_NAME = ".journal.jsonl"
+JOURNAL_VERSION = 1
+
+
+class JobJournal:
+    """
+    Append-only journal of the cards completed by a batch job in an output directory.
+    Every record is flushed to the OS right away (survives a crash of the process);
+    fsync is batched: at most every fsync_every records or fsync_interval seconds.
+    A journal left on disk marks an unfinished job that can be resumed.
+    """
+
+    def __init__(self, output_dir, resume=False, fsync_every=64, fsync_interval=1.0):
+        """
+        Initialize for output_dir. With resume the records of a previous run are
+        loaded, otherwise a journal left in output_dir is discarded.
+        """
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, JOURNAL_NAME)
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.job = None
+        self.completed = set()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        if resume:
+            self._load()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _load(self):
+        """Read the journal; a torn last line (crash during a write) is ignored."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if "job" in record:
+                    if record.get("version") != JOURNAL_VERSION:
+                        raise Exception(f"Неподдерживаемая версия журнала {self.path}")
+                    self.job = record["job"]
+                else:
+                    self.completed.update(record.get("done", []))
+
+    def _output_id(self, output_path):
+        return os.path.relpath(output_path, self.output_dir)
+
+    def start(self, job):
+        """
+        Open the journal for appending. job is a JSON-able description of the run;
+        resuming a journal written for a different job is an error.
+        """
+        if self.job is not None and self.job != job:
+            raise Exception(f"Журнал {self.path} относится к другому заданию (изменились настройки)")
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if self.job is None:
+            self.job = job
+            self._write({"version": JOURNAL_VERSION, "job": job})
+            self.sync()
+
+    def is_done(self, output_path):
+        """Check whether an output was completed by a previous run."""
+        return self._output_id(output_path) in self.completed and os.path.exists(output_path)
+
+    def record(self, output_paths):
+        """Record the outputs of a completed card."""
+        done = [self._output_id(path) for path in output_paths]
+        self.completed.update(done)
+        self._write({"done": done})
+        self._unsynced += 1
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def sync(self):
+        """Force the written records to disk."""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self, finished=False):
+        """
+        Sync and close the journal. A finished job removes it, and so does a job
+        without a single completed card: there is nothing to resume.
+        """
+        if self._file is None:
+            return
+        self.sync()
+        self._file.close()
+        self._file = None
+        if finished or not self.completed:
+            os.remove(self.path)
+
+
+def find_unfinished_job(output_dir):
+    """
+    Find the output directory of the latest unfinished job for output_dir:
+    output_dir itself or one of its numbered copies (output_dir_1, ...) with a journal.
+    Returns None when there is nothing to resume.
+    """
+    found = None
+    candidate = output_dir
+    index = 1
+    while os.path.exists(candidate):
+        if os.path.exists(os.path.join(candidate, JOURNAL_NAME)):
+            found = candidate
+        candidate = f"{output_dir}_{index}"
+        index += 1
+    return found
+
+
+class JobControl:
+    """
+    Cancel/pause switches for a running batch job, shared between threads.
+    The job checks them between cards, so a card is never left half written.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    def cancel(self):
+        """Stop the job after the cards already in progress."""
+        self._cancelled.set()
+        self._running.set()
+
+    def pause(self):
+        """Stop handing out new cards until resume() is called."""
+        self._running.clear()
+
+    def resume(self):
+        """Continue a paused job."""
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def wait(self):
+        """Block while paused. Returns False if the job was cancelled."""
+        self._running.wait()
+        return not self._cancelled.is_set()
@@ -1,20 +1,37 @@
 import sys
 import os
-import pandas as pd
-import numpy as np
+import time
+import threading
+
+# Отсчет времени запуска приложения (до импорта Qt и модулей обработки)
+_START_TIME = time.perf_counter()
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QLineEdit, QPushButton, QSpinBox, 
                             QTableWidget, QTableWidgetItem, QFileDialog, QMessageBox, 
                             QProgressBar, QComboBox, QGroupBox, QFormLayout, QDialogButtonBox,
-                            QRadioButton, QSlider)
+                            QRadioButton, QSlider, QCheckBox)
 from PyQt5.QtGui import QPixmap, QPainter, QColor, QPen, QBrush, QImage
-from PyQt5.QtCore import Qt, QRect, pyqtSignal, QThread, QTimer
+from PyQt5.QtCore import Qt, QRect, pyqtSignal, QThread, QTimer, QObject, QRunnable, QThreadPool
 
 from attached_assets.config_manager import ConfigManager
 from attached_assets.image_processor import ImageProcessor
 from attached_assets.anchor_position_editor import AnchorPositionEditor
+from attached_assets.slide_index import SlideIndex
+from attached_assets.position_formula import evaluate_formula, PositionFormulaError
+from attached_assets.photo_scanner import scan_articles, list_images, article_relpath
+from attached_assets.output_profiles import available_profiles, DEFAULT_OUTPUT_PROFILE
+from attached_assets.marketplace_variants import parse_variants
+from attached_assets.job_journal import JobControl
+from attached_assets.hot_folder import HotFolderWatcher
 from PIL import Image
 
+# Предустановленные размеры холста (ширина, высота)
+RESOLUTION_PRESETS = [(2000, 3000), (1000, 1500), (900, 1200)]
+
+# Задержка отложенного сохранения конфигурации из интерфейса, секунды
+CONFIG_SAVE_DELAY = 0.5
+
 # Класс SimplePositionSelector удален, вместо него используется AnchorPositionEditor
 
 class PositionEditorTab(QWidget):
@@ -51,7 +68,7 @@ class PositionEditorTab(QWidget):
         
         # Добавляем кнопку обновления
         self.refresh_visual_button = QPushButton("Обновить визуализацию")
-        self.refresh_visual_button.clicked.connect(self.canvas.update)
+        self.refresh_visual_button.clicked.connect(self.canvas.invalidate)
         visual_layout.addWidget(self.refresh_visual_button)
         
         visualization_widget.setLayout(visual_layout)
@@ -139,7 +156,7 @@ class PositionEditorTab(QWidget):
             if pos_id not in positions:
                 # Позиция была успешно удалена, просто обновляем UI
                 self.refresh_table()
-                self.canvas.update()
+                self.canvas.invalidate()
                 self.position_updated.emit()
                 return
             else:
@@ -158,7 +175,7 @@ class PositionEditorTab(QWidget):
         
         # Refresh UI
         self.refresh_table()
-        self.canvas.update()
+        self.canvas.invalidate()
         self.position_updated.emit()
         
         # Обновить список позиций в редакторе
@@ -210,9 +227,9 @@ class PositionEditorTab(QWidget):
                 "infografika_height": 300,
                 "MARGIN": 30
             }
-            eval(x_formula, {"__builtins__": {}}, context)
-            eval(y_formula, {"__builtins__": {}}, context)
-        except Exception as e:
+            evaluate_formula(x_formula, context)
+            evaluate_formula(y_formula, context)
+        except PositionFormulaError as e:
             QMessageBox.warning(self, "Ошибка", f"Некорректная формула: {str(e)}")
             return
         
@@ -227,7 +244,7 @@ class PositionEditorTab(QWidget):
         
         # Refresh UI
         self.refresh_table()
-        self.canvas.update()
+        self.canvas.invalidate()
         self.position_updated.emit()
         
         # Clear inputs
@@ -257,7 +274,7 @@ class PositionEditorTab(QWidget):
             
             # Refresh UI
             self.refresh_table()
-            self.canvas.update()
+            self.canvas.invalidate()
             self.position_updated.emit()
             
             # Обновить список позиций в редакторе
@@ -271,23 +288,27 @@ class PositionEditorTab(QWidget):
 class PositionVisualizer(QWidget):
     """
     Widget to visualize position configurations on a canvas.
+    The static canvas layer and the positions layer are cached as pixmaps;
+    the positions layer is rebuilt only for a new config revision, widget size
+    or canvas settings, so repaints do not evaluate position formulas.
     """
     def __init__(self, config_manager):
         super().__init__()
         self.config_manager = config_manager
         self.setMinimumSize(300, 400)
-        
-    def paintEvent(self, event):
-        """Paint the canvas with positions."""
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # Get settings
-        settings = self.config_manager.get_settings()
-        canvas_width = settings.get("canvas_width", 900)
-        canvas_height = settings.get("canvas_height", 1200)
-        margin = settings.get("margin", 30)
-        
+        self._background = None
+        self._background_key = None
+        self._positions_layer = None
+        self._positions_key = None
+    
+    def invalidate(self):
+        """Drop the cached layers and repaint (e.g. after positions were edited)."""
+        self._background_key = None
+        self._positions_key = None
+        self.update()
+    
+    def _layout(self, canvas_width, canvas_height):
+        """Get (scale_factor, display_width, display_height, offset_x, offset_y) for the widget size."""
         # Scale down for display
         scale_factor = min(self.width() / canvas_width, self.height() / canvas_height) * 0.9
         display_width = int(canvas_width * scale_factor)
@@ -296,6 +317,15 @@ class PositionVisualizer(QWidget):
         # Center the display
         offset_x = (self.width() - display_width) // 2
         offset_y = (self.height() - display_height) // 2
+        return scale_factor, display_width, display_height, offset_x, offset_y
+    
+    def _draw_background(self, canvas_width, canvas_height, margin):
+        """Draw the canvas, margin box and center lines into a pixmap."""
+        scale_factor, display_width, display_height, offset_x, offset_y = self._layout(canvas_width, canvas_height)
+        pixmap = QPixmap(self.size())
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
         
         # Draw canvas background
         painter.fillRect(offset_x, offset_y, display_width, display_height, QColor(211, 211, 211))
@@ -312,6 +342,16 @@ class PositionVisualizer(QWidget):
         center_y = offset_y + display_height // 2
         painter.drawLine(center_x, offset_y, center_x, offset_y + display_height)
         painter.drawLine(offset_x, center_y, offset_x + display_width, center_y)
+        painter.end()
+        return pixmap
+    
+    def _draw_positions(self, canvas_width, canvas_height, margin):
+        """Resolve all positions once and draw their markers into a pixmap."""
+        scale_factor, display_width, display_height, offset_x, offset_y = self._layout(canvas_width, canvas_height)
+        pixmap = QPixmap(self.size())
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
         
         # Sample infographic size
         sample_width = 300
@@ -350,6 +390,106 @@ class PositionVisualizer(QWidget):
             except Exception as e:
                 print(f"Ошибка отображения позиции {pos_id}: {e}")
                 continue
+        painter.end()
+        return pixmap
+    
+    def paintEvent(self, event):
+        """Paint the canvas with positions from the cached layers."""
+        # Get settings
+        settings = self.config_manager.get_settings()
+        canvas_width = settings.get("canvas_width", 900)
+        canvas_height = settings.get("canvas_height", 1200)
+        margin = settings.get("margin", 30)
+        
+        # Слои перерисовываются только при изменении размера, настроек или ревизии позиций
+        background_key = (self.width(), self.height(), canvas_width, canvas_height, margin)
+        if self._background_key != background_key:
+            self._background = self._draw_background(canvas_width, canvas_height, margin)
+            self._background_key = background_key
+        positions_key = background_key + (self.config_manager.revision,)
+        if self._positions_key != positions_key:
+            self._positions_layer = self._draw_positions(canvas_width, canvas_height, margin)
+            self._positions_key = positions_key
+        
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._background)
+        painter.drawPixmap(0, 0, self._positions_layer)
+        painter.end()
+
+class ScanThread(QThread):
+    """
+    Thread that walks a directory in the background and delivers found items
+    in batches, so combo boxes fill in incrementally without blocking the UI.
+    """
+    items_found = pyqtSignal(list)  # next batch of items
+    scan_finished = pyqtSignal(int)  # total number of items
+    error_occurred = pyqtSignal(str)  # error message
+    
+    # Пачка отправляется при наборе batch_size элементов или раз в batch_interval секунд
+    batch_size = 200
+    batch_interval = 0.1
+    
+    def __init__(self, scan_function):
+        """Initialize with a function that returns an iterable of items."""
+        super().__init__()
+        self.scan_function = scan_function
+        # Сканирование заменено новым: его пачки, еще стоящие в очереди событий, отбрасываются
+        self.stale = False
+    
+    def run(self):
+        total = 0
+        batch = []
+        last_emit = time.monotonic()
+        try:
+            for item in self.scan_function():
+                if self.isInterruptionRequested():
+                    return
+                batch.append(item)
+                now = time.monotonic()
+                if len(batch) >= self.batch_size or now - last_emit >= self.batch_interval:
+                    self.items_found.emit(batch)
+                    total += len(batch)
+                    batch = []
+                    last_emit = now
+            if batch:
+                self.items_found.emit(batch)
+                total += len(batch)
+            self.scan_finished.emit(total)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+
+class PreviewRenderSignals(QObject):
+    """
+    Signals of preview render tasks. Lives in the GUI thread, so results
+    emitted from pool threads are delivered through the event loop.
+    """
+    preview_ready = pyqtSignal(int, object)  # request id, (QImage, buffer)
+    error_occurred = pyqtSignal(int, str)  # request id, error message
+
+
+class PreviewRenderTask(QRunnable):
+    """
+    One preview render on a QThreadPool thread.
+    A task whose request is no longer the latest is dropped before rendering.
+    """
+    def __init__(self, request_id, render_function, is_current, signals):
+        super().__init__()
+        self.request_id = request_id
+        self.render_function = render_function
+        self.is_current = is_current
+        self.signals = signals
+    
+    def run(self):
+        if not self.is_current(self.request_id):
+            return
+        try:
+            result = self.render_function()
+        except Exception as e:
+            self.signals.error_occurred.emit(self.request_id, str(e))
+            return
+        self.signals.preview_ready.emit(self.request_id, result)
+
 
 class PreviewTab(QWidget):
     """
@@ -359,6 +499,25 @@ class PreviewTab(QWidget):
         super().__init__()
         self.config_manager = config_manager
         self.image_processor = ImageProcessor(config_manager)
+        self.slide_index = None
+        self._slide_index_key = None
+        # Фоновые сканеры директорий для списков артикулов и инфографики
+        self._article_scanner = None
+        self._infographic_scanner = None
+        self._stopping_scanners = set()
+        self._slide_index_lock = threading.Lock()
+        # Предпросмотр рисуется в пуле потоков; показывается только результат последнего запроса
+        self.preview_pool = QThreadPool()
+        self.preview_pool.setMaxThreadCount(2)
+        self.preview_signals = PreviewRenderSignals()
+        self.preview_signals.preview_ready.connect(self._on_preview_ready)
+        self.preview_signals.error_occurred.connect(self._on_preview_error)
+        self._preview_request_id = 0
+        # Отложенная перерисовка живого предпросмотра: быстрые переключения сливаются в одну
+        self.live_preview_timer = QTimer(self)
+        self.live_preview_timer.setSingleShot(True)
+        self.live_preview_timer.setInterval(150)
+        self.live_preview_timer.timeout.connect(self._live_preview)
         self.initUI()
         
     def initUI(self):
@@ -398,6 +557,10 @@ class PreviewTab(QWidget):
         infographic_layout.addWidget(QLabel("Позиция:"))
         infographic_layout.addWidget(self.position_combo)
         
+        self.use_excel_checkbox = QCheckBox("Инфографика из Excel")
+        self.use_excel_checkbox.setToolTip("Наложить всю инфографику, указанную в Excel для выбранного слайда")
+        infographic_layout.addWidget(self.use_excel_checkbox)
+        
         self.refresh_infographics_button = QPushButton("Обновить список")
         self.refresh_infographics_button.clicked.connect(self.refresh_infographics)
         infographic_layout.addWidget(self.refresh_infographics_button)
@@ -407,10 +570,21 @@ class PreviewTab(QWidget):
         
         layout.addLayout(selector_layout)
         
-        # Preview button
+        # Preview buttons
+        preview_buttons_layout = QHBoxLayout()
         self.preview_button = QPushButton("Сгенерировать предпросмотр")
-        self.preview_button.clicked.connect(self.generate_preview)
-        layout.addWidget(self.preview_button)
+        self.preview_button.clicked.connect(lambda: self.generate_preview())
+        preview_buttons_layout.addWidget(self.preview_button)
+        
+        self.full_preview_button = QPushButton("Полное разрешение")
+        self.full_preview_button.setToolTip("Отрисовать карточку в полном размере холста и уменьшить для показа")
+        self.full_preview_button.clicked.connect(lambda: self.generate_preview(full_resolution=True))
+        preview_buttons_layout.addWidget(self.full_preview_button)
+        
+        self.live_preview_checkbox = QCheckBox("Живой предпросмотр")
+        self.live_preview_checkbox.setToolTip("Перерисовывать предпросмотр при смене артикула, изображения, инфографики или позиции")
+        preview_buttons_layout.addWidget(self.live_preview_checkbox)
+        layout.addLayout(preview_buttons_layout)
         
         # Preview image
         self.preview_label = QLabel()
@@ -422,35 +596,86 @@ class PreviewTab(QWidget):
         # Connect article selection to image listing
         self.article_combo.currentIndexChanged.connect(self.refresh_images)
         
+        # Живой предпросмотр реагирует на смену любого выбора
+        for combo in (self.article_combo, self.image_combo, self.infographic_combo, self.position_combo):
+            combo.currentIndexChanged.connect(self.schedule_live_preview)
+        self.use_excel_checkbox.toggled.connect(self.schedule_live_preview)
+        self.live_preview_checkbox.toggled.connect(self.schedule_live_preview)
+        
         # Connect combos to position listing
         self.refresh_positions()
         
-        # Initial data population
+        # Initial data population: директории сканируются в фоне, списки заполняются по мере поиска
         self.refresh_articles()
         self.refresh_infographics()
         
         self.setLayout(layout)
     
+    def _start_scan(self, previous_scanner, scan_function, on_items, on_finished, error_prefix):
+        """
+        Stop the previous scanner of a list and start a new one. Batches of the
+        previous scanner that are still queued on the event loop are dropped,
+        even if it has already finished.
+        """
+        if previous_scanner is not None:
+            # Результаты прежнего сканирования больше не нужны
+            previous_scanner.stale = True
+            previous_scanner.items_found.disconnect()
+            previous_scanner.scan_finished.disconnect()
+            previous_scanner.error_occurred.disconnect()
+            if previous_scanner.isRunning():
+                # Поток хранится до завершения
+                previous_scanner.requestInterruption()
+                self._stopping_scanners.add(previous_scanner)
+                previous_scanner.finished.connect(
+                    lambda: self._stopping_scanners.discard(previous_scanner)
+                )
+        scanner = ScanThread(scan_function)
+        scanner.items_found.connect(lambda items: None if scanner.stale else on_items(items))
+        scanner.scan_finished.connect(lambda total: None if scanner.stale else on_finished(total))
+        scanner.error_occurred.connect(
+            lambda message: None if scanner.stale else
+            QMessageBox.critical(self, "Ошибка", f"{error_prefix}: {message}")
+        )
+        scanner.start()
+        return scanner
+    
+    def stop_scanners(self):
+        """Interrupt the background directory scans and wait for their threads to finish."""
+        scanners = set(self._stopping_scanners)
+        scanners.update(scanner for scanner in (self._article_scanner, self._infographic_scanner)
+                        if scanner is not None)
+        for scanner in scanners:
+            scanner.requestInterruption()
+        for scanner in scanners:
+            scanner.wait()
+        self._stopping_scanners.clear()
+    
     def refresh_articles(self):
-        """Refresh the list of articles from the photos directory."""
-        try:
-            self.article_combo.clear()
-            
-            photos_dir = self.config_manager.get_settings().get("photos_dir", "photos")
-            if not os.path.exists(photos_dir):
-                QMessageBox.warning(self, "Ошибка", f"Директория фото не найдена: {photos_dir}")
-                return
-            
-            articles = [d for d in os.listdir(photos_dir) if os.path.isdir(os.path.join(photos_dir, d))]
-            
-            if not articles:
-                QMessageBox.information(self, "Информация", "Артикулы не найдены.")
-                return
-            
-            for article in articles:
-                self.article_combo.addItem(article)
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить список артикулов: {str(e)}")
+        """Refresh the list of articles from the photos directory in the background."""
+        self.article_combo.clear()
+        
+        photos_dir = self.config_manager.get_settings().get("photos_dir", "photos")
+        if not os.path.exists(photos_dir):
+            QMessageBox.warning(self, "Ошибка", f"Директория фото не найдена: {photos_dir}")
+            return
+        
+        # Артикулы во вложенных папках показываются относительным путем
+        scan_depth = self.config_manager.get_settings().get("scan_depth", 1)
+        
+        def scan():
+            for article, image_paths in scan_articles(photos_dir, max_depth=scan_depth):
+                yield article_relpath(photos_dir, image_paths)
+        
+        self._article_scanner = self._start_scan(
+            self._article_scanner, scan, self.article_combo.addItems,
+            self._on_articles_scanned, "Не удалось загрузить список артикулов"
+        )
+    
+    def _on_articles_scanned(self, total):
+        """Report an empty article list once the scan is finished."""
+        if total == 0:
+            QMessageBox.information(self, "Информация", "Артикулы не найдены.")
     
     def refresh_images(self):
         """Refresh the list of images for the selected article."""
@@ -468,10 +693,8 @@ class PreviewTab(QWidget):
                 QMessageBox.warning(self, "Ошибка", f"Директория артикула не найдена: {article_dir}")
                 return
             
-            allowed_extensions = ['.png', '.jpg', '.jpeg', '.bmp']
-            images = [f for f in os.listdir(article_dir) 
-                     if os.path.isfile(os.path.join(article_dir, f)) and 
-                     f.lower().endswith(tuple(allowed_extensions))]
+            # Порядок как в generate_cards: индекс в списке совпадает с номером слайда
+            images = [os.path.basename(path) for path in list_images(article_dir)]
             
             if not images:
                 QMessageBox.information(self, "Информация", "Изображения не найдены.")
@@ -483,29 +706,32 @@ class PreviewTab(QWidget):
             QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить список изображений: {str(e)}")
     
     def refresh_infographics(self):
-        """Refresh the list of infographics."""
-        try:
-            self.infographic_combo.clear()
-            
-            # Add "None" option first
-            self.infographic_combo.addItem("Нет")
-            
-            infografika_dir = self.config_manager.get_settings().get("infografika_dir", "infografika")
-            if not os.path.exists(infografika_dir):
-                QMessageBox.warning(self, "Ошибка", f"Директория инфографики не найдена: {infografika_dir}")
-                return
-            
-            infographics = [os.path.splitext(f)[0] for f in os.listdir(infografika_dir) 
-                           if f.lower().endswith('.png')]
-            
-            if not infographics:
-                QMessageBox.information(self, "Информация", "Инфографика не найдена.")
-                return
-            
-            for infographic in infographics:
-                self.infographic_combo.addItem(infographic)
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить список инфографики: {str(e)}")
+        """Refresh the list of infographics in the background."""
+        self.infographic_combo.clear()
+        
+        # Add "None" option first
+        self.infographic_combo.addItem("Нет")
+        
+        infografika_dir = self.config_manager.get_settings().get("infografika_dir", "infografika")
+        if not os.path.exists(infografika_dir):
+            QMessageBox.warning(self, "Ошибка", f"Директория инфографики не найдена: {infografika_dir}")
+            return
+        
+        def scan():
+            with os.scandir(infografika_dir) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith('.png'):
+                        yield os.path.splitext(entry.name)[0]
+        
+        self._infographic_scanner = self._start_scan(
+            self._infographic_scanner, scan, self.infographic_combo.addItems,
+            self._on_infographics_scanned, "Не удалось загрузить список инфографики"
+        )
+    
+    def _on_infographics_scanned(self, total):
+        """Report an empty infographic list once the scan is finished."""
+        if total == 0:
+            QMessageBox.information(self, "Информация", "Инфографика не найдена.")
     
     def refresh_positions(self):
         """Refresh the list of positions."""
@@ -522,53 +748,133 @@ class PreviewTab(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить список позиций: {str(e)}")
     
-    def generate_preview(self):
-        """Generate a preview of the selected image with infographic."""
-        try:
-            # Get selected values
-            article = self.article_combo.currentText()
-            image = self.image_combo.currentText()
-            infographic = self.infographic_combo.currentText()
-            position = self.position_combo.currentText()
-            
-            if not article or not image:
-                QMessageBox.warning(self, "Ошибка", "Выберите артикул и изображение.")
-                return
-            
-            # Get paths
-            photos_dir = self.config_manager.get_settings().get("photos_dir", "photos")
-            infografika_dir = self.config_manager.get_settings().get("infografika_dir", "infografika")
-            photo_path = os.path.join(photos_dir, article, image)
-            
-            # Get settings
-            settings = self.config_manager.get_settings()
-            canvas_width = settings.get("canvas_width", 900)
-            canvas_height = settings.get("canvas_height", 1200)
-            
-            # Process image
-            canvas = self.image_processor.process_and_center_image(photo_path, canvas_width, canvas_height)
-            
-            # Add infographic if selected
-            if infographic != "Нет":
-                infographic_path = os.path.join(infografika_dir, infographic + ".png")
+    def get_slide_index(self):
+        """Get the Excel slide index, rebuilding it only when the workbook changes."""
+        excel_file = self.config_manager.get_settings().get("excel_file", "data.xlsx")
+        key = (excel_file, os.path.getmtime(excel_file))
+        # Вызывается из потоков предпросмотра: индекс строится одним потоком
+        with self._slide_index_lock:
+            if self.slide_index is None or self._slide_index_key != key:
+                self.slide_index = SlideIndex.from_excel(excel_file)
+                self._slide_index_key = key
+            return self.slide_index
+    
+    def schedule_live_preview(self, *args):
+        """Restart the debounce timer of the live preview."""
+        if self.live_preview_checkbox.isChecked():
+            self.live_preview_timer.start()
+    
+    def _live_preview(self):
+        """Render the live preview once the selection is complete."""
+        if self.article_combo.currentText() and self.image_combo.currentText():
+            self.generate_preview()
+    
+    def generate_preview(self, full_resolution=False):
+        """
+        Generate a preview of the selected image with infographic.
+        The current selection is rendered on the preview thread pool; only the
+        latest request is displayed, older ones are dropped.
+        By default the card is rendered directly at the size of the preview area;
+        full_resolution renders the whole canvas and scales it down.
+        """
+        # Get selected values
+        article = self.article_combo.currentText()
+        image = self.image_combo.currentText()
+        
+        if not article or not image:
+            QMessageBox.warning(self, "Ошибка", "Выберите артикул и изображение.")
+            return
+        
+        # Выбор фиксируется в потоке GUI, отрисовка идет в пуле
+        request = {
+            "article": article,
+            "image": image,
+            "slide_idx": self.image_combo.currentIndex(),
+            "infographic": self.infographic_combo.currentText(),
+            "position": self.position_combo.currentText(),
+            "use_excel": self.use_excel_checkbox.isChecked(),
+            "full_resolution": full_resolution,
+            "display_width": self.preview_label.width(),
+            "display_height": self.preview_label.height(),
+        }
+        self._preview_request_id += 1
+        self.preview_pool.start(PreviewRenderTask(
+            self._preview_request_id,
+            lambda: self._render_preview(request),
+            self._is_current_preview,
+            self.preview_signals,
+        ))
+    
+    def _is_current_preview(self, request_id):
+        """Check whether request_id is the latest preview request."""
+        return request_id == self._preview_request_id
+    
+    def _render_preview(self, request):
+        """
+        Render a preview request into a QImage. Runs on a pool thread.
+        Returns (QImage, buffer): the QImage may share the buffer, so both are kept together.
+        """
+        # Get paths
+        settings = self.config_manager.get_settings()
+        photos_dir = settings.get("photos_dir", "photos")
+        infografika_dir = settings.get("infografika_dir", "infografika")
+        photo_path = os.path.join(photos_dir, request["article"], request["image"])
+        
+        # Get settings
+        canvas_width = settings.get("canvas_width", 900)
+        canvas_height = settings.get("canvas_height", 1200)
+        
+        # Инфографика из Excel для этого слайда и выбранная вручную
+        overlays = []
+        if request["use_excel"]:
+            excel_article = os.path.basename(request["article"])
+            for sheet_name, infografika_name, excel_position in self.get_slide_index().get(excel_article, request["slide_idx"]):
+                infographic_path = os.path.join(infografika_dir, infografika_name + ".png")
                 if os.path.exists(infographic_path):
-                    position_id = position
-                    canvas = self.image_processor.overlay_infografika(canvas, infographic_path, position_id)
-            
-            # Convert PIL image to QPixmap for display
-            img_data = canvas.convert("RGBA").tobytes("raw", "RGBA")
-            qimage = QImage(img_data, canvas.width, canvas.height, QImage.Format_RGBA8888)
-            pixmap = QPixmap.fromImage(qimage)
-            
-            # Scale if necessary to fit the label
-            if pixmap.width() > self.preview_label.width() or pixmap.height() > self.preview_label.height():
-                pixmap = pixmap.scaled(self.preview_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            
-            # Display the preview
-            self.preview_label.setPixmap(pixmap)
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось сгенерировать предпросмотр: {str(e)}")
+                    overlays.append((infographic_path, excel_position))
+        
+        if request["infographic"] != "Нет":
+            infographic_path = os.path.join(infografika_dir, request["infographic"] + ".png")
+            if os.path.exists(infographic_path):
+                overlays.append((infographic_path, request["position"]))
+        
+        display_width, display_height = request["display_width"], request["display_height"]
+        if request["full_resolution"]:
+            # Базовый холст берется из кэша: при смене инфографики или позиции фото не декодируется заново
+            canvas = self.image_processor.get_base_canvas(photo_path, canvas_width, canvas_height)
+            for infographic_path, position_id in overlays:
+                canvas = self.image_processor.overlay_infografika(canvas, infographic_path, position_id)
+        else:
+            # Прокси: фото и инфографика сразу в размере области предпросмотра
+            canvas = self.image_processor.render_proxy(
+                photo_path, overlays, canvas_width, canvas_height, display_width, display_height
+            )
+        
+        # Convert PIL image to QImage for display
+        # tobytes() — единственная копия холста (у PIL нет открытого доступа к своему буферу);
+        # QImage использует буфер img_data без еще одной копии: он должен жить, пока жив qimage
+        if canvas.mode != "RGB":
+            canvas = canvas.convert("RGB")
+        img_data = canvas.tobytes("raw", "RGB")
+        qimage = QImage(img_data, canvas.width, canvas.height, 3 * canvas.width, QImage.Format_RGB888)
+        
+        # Scale if necessary to fit the label (до QPixmap, чтобы копировать уже уменьшенное изображение)
+        if qimage.width() > display_width or qimage.height() > display_height:
+            qimage = qimage.scaled(display_width, display_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return qimage, img_data
+    
+    def _on_preview_ready(self, request_id, result):
+        """Display a rendered preview unless a newer request was made meanwhile."""
+        if not self._is_current_preview(request_id):
+            return
+        qimage, _ = result
+        # QPixmap создается только в потоке GUI
+        self.preview_label.setPixmap(QPixmap.fromImage(qimage))
+    
+    def _on_preview_error(self, request_id, message):
+        """Report an error of the latest preview request."""
+        if self._is_current_preview(request_id):
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сгенерировать предпросмотр: {message}")
 
 class ProcessImagesThread(QThread):
     """
@@ -578,10 +884,13 @@ class ProcessImagesThread(QThread):
     processing_complete = pyqtSignal(int, str)  # number of processed images, output directory
     error_occurred = pyqtSignal(str)  # error message
     
-    def __init__(self, config_manager, image_processor):
+    def __init__(self, config_manager, image_processor, resume=False):
         super().__init__()
         self.config_manager = config_manager
         self.image_processor = image_processor
+        self.resume = resume
+        # Пауза и отмена между карточками
+        self.job_control = JobControl()
         
     def run(self):
         try:
@@ -594,6 +903,12 @@ class ProcessImagesThread(QThread):
             canvas_width = settings.get("canvas_width", 900)
             canvas_height = settings.get("canvas_height", 1200)
             margin = settings.get("margin", 30)
+            workers = settings.get("workers", 1)
+            incremental = settings.get("incremental", False)
+            scan_depth = settings.get("scan_depth", 1)
+            progress_max_rate = settings.get("progress_max_rate", 10)
+            output_sizes = settings.get("output_sizes", [])
+            variants = settings.get("marketplace_variants", [])
             
             # Verify required paths
             if not os.path.exists(photos_dir):
@@ -610,11 +925,10 @@ class ProcessImagesThread(QThread):
             
             # Process images from all Excel sheets
             try:
-                # Проверяем Excel файл на наличие листов
-                xl = pd.ExcelFile(excel_file)
-                sheet_names = xl.sheet_names
+                # Читаем Excel файл один раз и проверяем наличие листов
+                slide_index = SlideIndex.from_excel(excel_file)
                 
-                if not sheet_names:
+                if not slide_index.sheet_names:
                     self.error_occurred.emit("Excel файл не содержит листов")
                     return
                 
@@ -622,7 +936,16 @@ class ProcessImagesThread(QThread):
                 processed_count, final_output_dir = self.image_processor.generate_cards(
                     excel_file, photos_dir, infografika_dir, output_dir,
                     canvas_width, canvas_height, margin,
-                    progress_callback=self.progress_updated.emit
+                    progress_callback=self.progress_updated.emit,
+                    slide_index=slide_index,
+                    workers=workers,
+                    incremental=incremental,
+                    scan_depth=scan_depth,
+                    progress_max_rate=progress_max_rate,
+                    output_sizes=output_sizes,
+                    variants=variants,
+                    resume=self.resume,
+                    job_control=self.job_control
                 )
                 
                 self.processing_complete.emit(processed_count, final_output_dir)
@@ -633,6 +956,47 @@ class ProcessImagesThread(QThread):
         except Exception as e:
             self.error_occurred.emit(f"Ошибка в потоке обработки: {str(e)}")
 
+class WatchThread(QThread):
+    """
+    Thread for the watch mode: renders new and changed article folders as they appear.
+    """
+    batch_finished = pyqtSignal(dict)  # totals of a rendered batch
+    error_occurred = pyqtSignal(str)  # error message
+    
+    def __init__(self, config_manager, image_processor):
+        super().__init__()
+        self.config_manager = config_manager
+        self.image_processor = image_processor
+        self.stop_event = threading.Event()
+    
+    def stop(self):
+        """Stop watching after the current batch."""
+        self.stop_event.set()
+    
+    def run(self):
+        settings = self.config_manager.get_settings()
+        watcher = None
+        try:
+            watcher = HotFolderWatcher(
+                self.image_processor,
+                settings.get("excel_file", "data.xlsx"),
+                settings.get("photos_dir", "photos"),
+                settings.get("infografika_dir", "infografika"),
+                settings.get("output_dir", "output"),
+                scan_depth=settings.get("scan_depth", 1),
+                workers=settings.get("workers", 1),
+                interval=settings.get("watch_interval", 2),
+                output_sizes=settings.get("output_sizes", []),
+                variants=settings.get("marketplace_variants", [])
+            )
+            watcher.run(self.stop_event, on_batch=self.batch_finished.emit,
+                        on_error=self.error_occurred.emit)
+        except Exception as e:
+            self.error_occurred.emit(f"Ошибка слежения за папкой: {str(e)}")
+        finally:
+            if watcher is not None:
+                watcher.close()
+
 class ProcessTab(QWidget):
     """
     Tab for processing all images according to Excel data.
@@ -641,6 +1005,8 @@ class ProcessTab(QWidget):
         super().__init__()
         self.config_manager = config_manager
         self.image_processor = ImageProcessor(config_manager)
+        self.process_thread = None
+        self.watch_thread = None
         self.initUI()
         
     def initUI(self):
@@ -654,28 +1020,44 @@ class ProcessTab(QWidget):
         presets_layout = QHBoxLayout()
         presets_layout.addWidget(QLabel("Предустановки:"))
         
-        # 2000x3000
-        preset_2000x3000 = QPushButton("2000 x 3000")
-        preset_2000x3000.clicked.connect(lambda: self.set_resolution(2000, 3000))
-        presets_layout.addWidget(preset_2000x3000)
+        for width, height in RESOLUTION_PRESETS:
+            preset_button = QPushButton(f"{width} x {height}")
+            preset_button.clicked.connect(lambda checked, w=width, h=height: self.set_resolution(w, h))
+            presets_layout.addWidget(preset_button)
         
-        # 1000x1500
-        preset_1000x1500 = QPushButton("1000 x 1500")
-        preset_1000x1500.clicked.connect(lambda: self.set_resolution(1000, 1500))
-        presets_layout.addWidget(preset_1000x1500)
+        canvas_layout.addLayout(presets_layout)
         
-        # 900x1200
-        preset_900x1200 = QPushButton("900 x 1200")
-        preset_900x1200.clicked.connect(lambda: self.set_resolution(900, 1200))
-        presets_layout.addWidget(preset_900x1200)
+        settings = self.config_manager.get_settings()
         
-        canvas_layout.addLayout(presets_layout)
+        # Несколько размеров за один проход: каждый отмеченный размер в своей подпапке
+        sizes_layout = QHBoxLayout()
+        sizes_layout.addWidget(QLabel("Размеры вывода:"))
+        selected_sizes = {tuple(size) for size in settings.get("output_sizes", [])}
+        self.size_checkboxes = []
+        for width, height in RESOLUTION_PRESETS:
+            checkbox = QCheckBox(f"{width} x {height}")
+            checkbox.setChecked((width, height) in selected_sizes)
+            checkbox.toggled.connect(self.update_output_sizes)
+            sizes_layout.addWidget(checkbox)
+            self.size_checkboxes.append((width, height, checkbox))
+        sizes_hint = QLabel("(ничего не отмечено — один размер холста)")
+        sizes_hint.setStyleSheet("color: gray;")
+        sizes_layout.addWidget(sizes_hint)
+        sizes_layout.addStretch()
+        canvas_layout.addLayout(sizes_layout)
+        
+        # Варианты маркетплейсов: общий холст, своя инфографика и подпапка для каждого
+        variants_layout = QHBoxLayout()
+        variants_layout.addWidget(QLabel("Варианты маркетплейсов:"))
+        self.variants_input = QLineEdit(", ".join(settings.get("marketplace_variants", [])))
+        self.variants_input.setPlaceholderText("например: WB, OZON")
+        self.variants_input.editingFinished.connect(self.update_variants)
+        variants_layout.addWidget(self.variants_input)
+        canvas_layout.addLayout(variants_layout)
         
         # Custom resolution
         custom_layout = QFormLayout()
         
-        settings = self.config_manager.get_settings()
-        
         self.width_input = QSpinBox()
         self.width_input.setRange(100, 5000)
         self.width_input.setValue(settings.get("canvas_width", 900))
@@ -722,9 +1104,41 @@ class ProcessTab(QWidget):
         process_group = QGroupBox("Обработка")
         process_layout = QVBoxLayout()
         
+        # Output encoding profile
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("Формат вывода:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItems(sorted(available_profiles(settings)))
+        self.profile_combo.setCurrentText(settings.get("output_profile", DEFAULT_OUTPUT_PROFILE))
+        self.profile_combo.currentTextChanged.connect(
+            lambda name: self.config_manager.update_settings(output_profile=name))
+        profile_layout.addWidget(self.profile_combo)
+        process_layout.addLayout(profile_layout)
+        
+        self.incremental_checkbox = QCheckBox("Инкрементальная сборка (только измененные карточки)")
+        self.incremental_checkbox.setChecked(settings.get("incremental", False))
+        self.incremental_checkbox.toggled.connect(
+            lambda checked: self.config_manager.update_settings(incremental=checked))
+        process_layout.addWidget(self.incremental_checkbox)
+        
+        self.resume_checkbox = QCheckBox("Продолжить прерванную обработку")
+        process_layout.addWidget(self.resume_checkbox)
+        
+        buttons_layout = QHBoxLayout()
         self.process_button = QPushButton("Начать обработку")
         self.process_button.clicked.connect(self.process_images)
-        process_layout.addWidget(self.process_button)
+        buttons_layout.addWidget(self.process_button)
+        
+        self.pause_button = QPushButton("Пауза")
+        self.pause_button.setEnabled(False)
+        self.pause_button.clicked.connect(self.toggle_pause)
+        buttons_layout.addWidget(self.pause_button)
+        
+        self.cancel_button = QPushButton("Отменить")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_processing)
+        buttons_layout.addWidget(self.cancel_button)
+        process_layout.addLayout(buttons_layout)
         
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
@@ -734,6 +1148,15 @@ class ProcessTab(QWidget):
         self.result_label = QLabel()
         process_layout.addWidget(self.result_label)
         
+        # Режим слежения: новые и измененные папки артикулов обрабатываются сами
+        self.watch_button = QPushButton("Следить за папкой фото")
+        self.watch_button.setCheckable(True)
+        self.watch_button.toggled.connect(self.toggle_watch)
+        process_layout.addWidget(self.watch_button)
+        
+        self.watch_label = QLabel()
+        process_layout.addWidget(self.watch_label)
+        
         process_group.setLayout(process_layout)
         layout.addWidget(process_group)
         
@@ -748,6 +1171,18 @@ class ProcessTab(QWidget):
         self.height_input.setValue(height)
         self.update_settings()
     
+    def update_output_sizes(self):
+        """Сохранить отмеченные размеры вывода."""
+        sizes = [[width, height] for width, height, checkbox in self.size_checkboxes
+                 if checkbox.isChecked()]
+        self.config_manager.update_settings(output_sizes=sizes)
+    
+    def update_variants(self):
+        """Сохранить варианты маркетплейсов."""
+        variants = parse_variants(self.variants_input.text())
+        if variants != self.config_manager.get_settings().get("marketplace_variants", []):
+            self.config_manager.update_settings(marketplace_variants=variants)
+    
     def update_settings(self):
         """Обновить настройки размеров холста."""
         width = self.width_input.value()
@@ -801,7 +1236,8 @@ class ProcessTab(QWidget):
             return
         
         # Start processing thread
-        self.process_thread = ProcessImagesThread(self.config_manager, self.image_processor)
+        self.process_thread = ProcessImagesThread(self.config_manager, self.image_processor,
+                                                  resume=self.resume_checkbox.isChecked())
         self.process_thread.progress_updated.connect(self.update_progress)
         self.process_thread.processing_complete.connect(self.processing_complete)
         self.process_thread.error_occurred.connect(self.processing_error)
@@ -809,6 +1245,7 @@ class ProcessTab(QWidget):
         # Disable process button while processing
         self.process_button.setEnabled(False)
         self.process_button.setText("Обработка...")
+        self.set_job_controls_enabled(True)
         
         # Start thread
         self.process_thread.start()
@@ -819,10 +1256,82 @@ class ProcessTab(QWidget):
         self.progress_bar.setValue(progress)
         self.result_label.setText(f"Обработано: {current} из {total}")
     
+    def toggle_watch(self, checked):
+        """Start or stop the watch mode."""
+        if checked:
+            self.watch_thread = WatchThread(self.config_manager, ImageProcessor(self.config_manager))
+            self.watch_thread.batch_finished.connect(self.on_watch_batch)
+            self.watch_thread.error_occurred.connect(
+                lambda message: self.watch_label.setText(f"Ошибка: {message}"))
+            self.watch_thread.start()
+            self.watch_button.setText("Остановить слежение")
+            self.watch_label.setText(f"Слежение за {self.config_manager.get_settings().get('photos_dir', 'photos')}...")
+        else:
+            self.stop_watching()
+            self.watch_button.setText("Следить за папкой фото")
+            self.watch_label.setText("Слежение остановлено")
+    
+    def stop_watching(self):
+        """Stop the watch thread and wait for the current batch to finish."""
+        if self.watch_thread is not None:
+            self.watch_thread.stop()
+            self.watch_thread.wait()
+            self.watch_thread = None
+    
+    def on_watch_batch(self, totals):
+        """Show the totals of a batch rendered by the watch mode."""
+        self.watch_label.setText(
+            f"{time.strftime('%H:%M:%S')}: артикулов {totals['articles']}, "
+            f"обработано {totals['processed']}, ошибок {totals['failed']}")
+    
+    def set_job_controls_enabled(self, enabled):
+        """Enable the pause/cancel buttons while a job is running."""
+        self.pause_button.setEnabled(enabled)
+        self.pause_button.setText("Пауза")
+        self.cancel_button.setEnabled(enabled)
+    
+    def toggle_pause(self):
+        """Pause or continue the running job (between cards)."""
+        job_control = self.process_thread.job_control
+        if job_control.paused:
+            job_control.resume()
+            self.pause_button.setText("Пауза")
+            self.process_button.setText("Обработка...")
+        else:
+            job_control.pause()
+            self.pause_button.setText("Продолжить")
+            self.process_button.setText("Пауза...")
+    
+    def cancel_processing(self):
+        """Cancel the running job after the cards in progress."""
+        self.process_thread.job_control.cancel()
+        self.set_job_controls_enabled(False)
+        self.process_button.setText("Отмена...")
+    
+    def stop_processing(self):
+        """
+        Cancel the running job and wait for its thread. The cards in progress are
+        finished and the job journal is closed, so the job can be resumed later.
+        """
+        if self.process_thread is not None and self.process_thread.isRunning():
+            # Окно закрывается — итоги задания уже не показываются
+            self.process_thread.progress_updated.disconnect()
+            self.process_thread.processing_complete.disconnect()
+            self.process_thread.error_occurred.disconnect()
+            self.process_thread.job_control.cancel()
+            self.process_thread.wait()
+    
     def processing_complete(self, processed_count, output_dir):
         """Handle processing completion."""
         self.process_button.setEnabled(True)
         self.process_button.setText("Начать обработку")
+        self.set_job_controls_enabled(False)
+        if (self.image_processor.last_run or {}).get("cancelled"):
+            self.result_label.setText(f"Обработка отменена. Обработано изображений: {processed_count}")
+            QMessageBox.information(self, "Обработка отменена",
+                                   f"Обработка отменена.\nОбработано: {processed_count} изображений.\n"
+                                   f"Продолжить можно с отметкой \"Продолжить прерванную обработку\".")
+            return
         self.progress_bar.setValue(100)
         self.result_label.setText(f"Обработка завершена. Обработано изображений: {processed_count}")
         QMessageBox.information(self, "Обработка завершена", 
@@ -832,6 +1341,7 @@ class ProcessTab(QWidget):
         """Handle processing error."""
         self.process_button.setEnabled(True)
         self.process_button.setText("Начать обработку")
+        self.set_job_controls_enabled(False)
         self.result_label.setText(f"Ошибка: {error_message}")
         QMessageBox.critical(self, "Ошибка обработки", error_message)
 
@@ -908,6 +1418,19 @@ class SettingsDialog(QWidget):
         self.margin_input.setValue(settings.get("margin", 30))
         form_layout.addRow("Отступ (px):", self.margin_input)
         
+        # Parallel processing setting (0 = all cores)
+        self.workers_input = QSpinBox()
+        self.workers_input.setRange(0, 256)
+        self.workers_input.setValue(settings.get("workers", 1))
+        self.workers_input.setSpecialValueText("Все ядра")
+        form_layout.addRow("Процессов обработки:", self.workers_input)
+        
+        # Depth of nested article folders under the photos directory
+        self.scan_depth_input = QSpinBox()
+        self.scan_depth_input.setRange(1, 10)
+        self.scan_depth_input.setValue(settings.get("scan_depth", 1))
+        form_layout.addRow("Глубина поиска артикулов:", self.scan_depth_input)
+        
         layout.addLayout(form_layout)
         
         # Buttons
@@ -948,7 +1471,9 @@ class SettingsDialog(QWidget):
             excel_file=self.excel_file_input.text(),
             canvas_width=self.canvas_width_input.value(),
             canvas_height=self.canvas_height_input.value(),
-            margin=self.margin_input.value()
+            margin=self.margin_input.value(),
+            workers=self.workers_input.value(),
+            scan_depth=self.scan_depth_input.value()
         )
         
         # Signal that settings have been updated
@@ -960,10 +1485,15 @@ class SettingsDialog(QWidget):
 class MainWindow(QMainWindow):
     """
     Main application window.
+    Only the first tab is built at startup; the others are built on first activation.
     """
     def __init__(self):
         super().__init__()
-        self.config_manager = ConfigManager()
+        # Правки из интерфейса сохраняются в config.json отложенно, одной записью на серию изменений
+        self.config_manager = ConfigManager(save_delay=CONFIG_SAVE_DELAY)
+        self.preview_tab = None
+        self.process_tab = None
+        self.startup_time = None
         self.initUI()
         
     def initUI(self):
@@ -994,25 +1524,72 @@ class MainWindow(QMainWindow):
         layout = QVBoxLayout()
         
         # Create tabs
-        tabs = QTabWidget()
+        self.tabs = QTabWidget()
         
         # Position editor tab
         self.position_editor_tab = PositionEditorTab(self.config_manager)
-        self.position_editor_tab.position_updated.connect(lambda: tabs.widget(1).refresh_positions())
-        tabs.addTab(self.position_editor_tab, "Редактор позиций")
+        self.position_editor_tab.position_updated.connect(self.on_position_updated)
+        self.tabs.addTab(self.position_editor_tab, "Редактор позиций")
         
-        # Preview tab
-        self.preview_tab = PreviewTab(self.config_manager)
-        tabs.addTab(self.preview_tab, "Предпросмотр")
-        
-        # Process tab
-        self.process_tab = ProcessTab(self.config_manager)
-        tabs.addTab(self.process_tab, "Обработка")
+        # Остальные вкладки создаются при первом открытии, до этого на их месте заглушки
+        self._tab_builders = {
+            self.tabs.addTab(QWidget(), "Предпросмотр"): self._build_preview_tab,
+            self.tabs.addTab(QWidget(), "Обработка"): self._build_process_tab,
+        }
+        self.tabs.currentChanged.connect(self.on_tab_changed)
         
-        layout.addWidget(tabs)
+        layout.addWidget(self.tabs)
         
         central_widget.setLayout(layout)
     
+    def _build_preview_tab(self):
+        self.preview_tab = PreviewTab(self.config_manager)
+        return self.preview_tab
+    
+    def _build_process_tab(self):
+        self.process_tab = ProcessTab(self.config_manager)
+        return self.process_tab
+    
+    def on_tab_changed(self, index):
+        """Build a tab on its first activation."""
+        builder = self._tab_builders.pop(index, None)
+        if builder is None:
+            return
+        start = time.perf_counter()
+        title = self.tabs.tabText(index)
+        placeholder = self.tabs.widget(index)
+        widget = builder()
+        self.tabs.blockSignals(True)
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, widget, title)
+        self.tabs.setCurrentIndex(index)
+        self.tabs.blockSignals(False)
+        placeholder.deleteLater()
+        print(f"Вкладка \"{title}\" создана за {time.perf_counter() - start:.3f} с")
+    
+    def on_position_updated(self):
+        """Refresh the position list of the preview tab if it is built."""
+        if self.preview_tab is not None:
+            self.preview_tab.refresh_positions()
+    
+    def record_startup_time(self):
+        """Record the time from process start to the first event loop iteration."""
+        self.startup_time = time.perf_counter() - _START_TIME
+        print(f"Время запуска: {self.startup_time:.3f} с")
+    
+    def closeEvent(self, event):
+        """
+        Stop the background scans, the running job and the watch mode and write
+        pending configuration changes before closing.
+        """
+        if self.preview_tab is not None:
+            self.preview_tab.stop_scanners()
+        if self.process_tab is not None:
+            self.process_tab.stop_processing()
+            self.process_tab.stop_watching()
+        self.config_manager.flush()
+        super().closeEvent(event)
+    
     def open_settings(self):
         """Open the settings dialog."""
         self.settings_dialog = SettingsDialog(self.config_manager)
@@ -1027,17 +1604,21 @@ class MainWindow(QMainWindow):
         infografika_dir = settings.get("infografika_dir", "infografika")
         excel_file = settings.get("excel_file", "data.xlsx")
         
-        self.process_tab.update_status_label(photos_dir, infografika_dir, excel_file)
+        if self.process_tab is not None:
+            self.process_tab.update_status_label(photos_dir, infografika_dir, excel_file)
         
         # Update preview tab combos
-        self.preview_tab.refresh_articles()
-        self.preview_tab.refresh_infographics()
+        if self.preview_tab is not None:
+            self.preview_tab.refresh_articles()
+            self.preview_tab.refresh_infographics()
     
     def show_about(self):
         """Show about dialog."""
+        startup = f"{self.startup_time:.2f} с" if self.startup_time is not None else "—"
         QMessageBox.about(self, "О программе", 
-                        """<b>Редактор позиций и обработка изображений</b>
+                        f"""<b>Редактор позиций и обработка изображений</b>
                         <p>Версия 1.0.0</p>
+                        <p>Время запуска: {startup}</p>
                         <p>Программа для удобного создания и редактирования 
                         позиций инфографики, а также для автоматизированной 
                         обработки фотографий согласно данным из Excel файла.</p>
@@ -1047,6 +1628,8 @@ def main():
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    # Время запуска фиксируется, когда окно показано и цикл событий начал работу
+    QTimer.singleShot(0, window.record_startup_time)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
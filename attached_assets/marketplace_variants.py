@@ -0,0 +1,24 @@
+def parse_variants(value):
+    """Parse marketplace variants from a list or a comma separated string ("WB, OZON")."""
+    if isinstance(value, str):
+        value = value.split(",")
+    variants = []
+    for variant in value or []:
+        variant = str(variant).strip()
+        if variant and variant not in variants:
+            variants.append(variant)
+    return variants
+
+
+def variant_infografika_name(infografika_name, variant, variants):
+    """
+    Get the infographic name for a marketplace variant.
+    A name ending with one of the variant suffixes ("kari WB") gets the suffix of
+    the requested variant ("kari OZON"); other names are shared by all variants.
+    """
+    lowered = infografika_name.lower()
+    for other in variants:
+        suffix = " " + other
+        if lowered.endswith(suffix.lower()):
+            return infografika_name[:-len(suffix)] + " " + variant
+    return infografika_name
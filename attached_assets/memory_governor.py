@@ -0,0 +1,151 @@
+import sys
+import mmap
+import threading
+
+from PIL import Image
+
+try:
+    import resource
+except ImportError:
+    # Windows: пиковый RSS недоступен
+    resource = None
+
+MB = 1024 * 1024
+
+# PIL хранит многоканальные изображения по 4 байта на пиксель (RGB тоже)
+_BYTES_PER_PIXEL = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2, 'I': 4, 'F': 4}
+
+# Режимы, которые декодируются без последующей конвертации (см. ImageProcessor._resizable)
+_RESAMPLE_MODES = ('RGB', 'RGBA', 'L', 'LA', 'CMYK')
+
+# Image.resize с reducing_gap=3 сначала уменьшает снимок целочисленно не более чем
+# до 3x размера холста по каждой стороне: промежуточное изображение <= 9 холстов
+_REDUCE_FACTOR = 9
+
+# Запас на Python, Pillow и очереди в каждом процессе-воркере
+WORKER_OVERHEAD_BYTES = 64 * MB
+
+# Наименьший бюджет на карточки после вычета уже занятой памяти
+MIN_BUDGET_BYTES = 64 * MB
+
+
+def estimate_card_bytes(image_processor, task):
+    """
+    Estimate the peak memory of rendering a card task from the photo header
+    (size and mode, after JPEG draft scaling) and its canvas sizes:
+    the decoded photo (twice if its mode is converted), the largest resampling
+    intermediate, all finished canvases and two canvas-sized temporaries
+    (rotation, flattening, compositing).
+    """
+    sizes = {(output.width, output.height) for output in task.outputs}
+    with Image.open(task.photo_path) as img:
+        # draft() только меняет размер декодирования, данные не читаются
+        image_processor.draft_for_canvas(img, max(width for width, _ in sizes),
+                                         max(height for _, height in sizes))
+        source_pixels = img.width * img.height
+        mode = img.mode
+    source_bytes = source_pixels * _BYTES_PER_PIXEL.get(mode, 4)
+    if mode not in _RESAMPLE_MODES:
+        source_bytes += source_pixels * 4
+
+    largest_canvas = max(width * height for width, height in sizes) * 4
+    intermediate = min(source_pixels * 4, largest_canvas * _REDUCE_FACTOR)
+    canvases = sum(output.width * output.height * 4 for output in task.outputs)
+    return source_bytes + intermediate + canvases + 2 * largest_canvas
+
+
+class MemoryBudget:
+    """
+    Byte-counting semaphore that caps the estimated memory of the tasks in flight.
+    A task larger than the whole budget is still admitted when nothing else is
+    in flight, so the run degrades to one task at a time instead of stalling.
+    """
+
+    def __init__(self, budget_bytes):
+        """Initialize with the budget in bytes."""
+        self.budget = max(0, int(budget_bytes))
+        self.used = 0
+        self.peak = 0
+        self.waits = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes, stop_event=None):
+        """
+        Reserve nbytes, waiting while they do not fit into the budget.
+        Returns False if stop_event was set while waiting.
+        """
+        with self._condition:
+            if self.used and self.used + nbytes > self.budget:
+                self.waits += 1
+            while self.used and self.used + nbytes > self.budget:
+                self._condition.wait(0.1)
+                if stop_event is not None and stop_event.is_set():
+                    return False
+            self.used += nbytes
+            self.peak = max(self.peak, self.used)
+            return True
+
+    def release(self, nbytes):
+        """Return nbytes reserved by acquire()."""
+        with self._condition:
+            self.used -= nbytes
+            self._condition.notify_all()
+
+    def summary(self):
+        return {
+            "budget_mb": round(self.budget / MB, 1),
+            "peak_reserved_mb": round(self.peak / MB, 1),
+            "waits": self.waits,
+        }
+
+
+def create_budget(budget_mb, workers=1):
+    """
+    Create the MemoryBudget for a run from the "memory_budget_mb" setting
+    (0 or None = no limit). The RSS the main process already uses and a fixed
+    overhead per worker process are subtracted from the budget; what is left
+    is never below MIN_BUDGET_BYTES.
+    """
+    if not budget_mb:
+        return None
+    reserved = current_rss_bytes() + (WORKER_OVERHEAD_BYTES * workers if workers > 1 else 0)
+    budget = budget_mb * MB - reserved
+    if budget < MIN_BUDGET_BYTES:
+        print(f"Предупреждение: бюджет памяти {budget_mb} МБ не покрывает уже занятую память "
+              f"и запас процессов ({reserved // MB} МБ), на карточки оставлено "
+              f"{MIN_BUDGET_BYTES // MB} МБ — крупные карточки будут обрабатываться по одной")
+        budget = MIN_BUDGET_BYTES
+    return MemoryBudget(budget)
+
+
+def current_rss_bytes():
+    """Get the resident set size of this process (0 if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except Exception:
+        return 0
+
+
+def process_peak_rss_bytes():
+    """Get the peak RSS of this process since it started, in bytes; None where getrusage is unavailable."""
+    if resource is None:
+        return None
+    # ru_maxrss — в килобайтах в Linux и в байтах в macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+
+
+def peak_rss_mb(worker_peak_bytes=None):
+    """
+    Get the peak RSS of this process since it started and, when a worker pool
+    ran, the largest peak reported by its workers (see RenderPool.worker_peak_rss),
+    in MB; None where getrusage is unavailable.
+    """
+    main_peak = process_peak_rss_bytes()
+    if main_peak is None:
+        return None
+    peak = {"main": round(main_peak / MB, 1)}
+    if worker_peak_bytes:
+        peak["worker"] = round(worker_peak_bytes / MB, 1)
+    return peak
@@ -0,0 +1,67 @@
+import copy
+
+# Профили кодирования выходных карточек; могут быть переопределены в config.json
+DEFAULT_OUTPUT_PROFILES = {
+    "png": {"format": "PNG", "compress_level": 6},
+    "png_fast": {"format": "PNG", "compress_level": 1},
+    "jpeg": {"format": "JPEG", "quality": 90, "optimize": True, "progressive": True,
+             "subsampling": "4:2:0"},
+    "webp": {"format": "WEBP", "quality": 85, "method": 4},
+}
+
+DEFAULT_OUTPUT_PROFILE = "png"
+
+_EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
+
+# Параметры PIL, которые допустимы для каждого формата
+_SAVE_OPTIONS = {
+    "PNG": ("compress_level", "optimize"),
+    "JPEG": ("quality", "optimize", "progressive", "subsampling"),
+    "WEBP": ("quality", "method", "lossless"),
+}
+
+
+def available_profiles(settings):
+    """Get all profiles: the built-in ones updated with "output_profiles" from settings."""
+    profiles = copy.deepcopy(DEFAULT_OUTPUT_PROFILES)
+    profiles.update(settings.get("output_profiles", {}))
+    return profiles
+
+
+def get_profile(settings, name=None):
+    """Get a profile by name (default: the "output_profile" setting) with its name included."""
+    name = name or settings.get("output_profile", DEFAULT_OUTPUT_PROFILE)
+    profiles = available_profiles(settings)
+    if name not in profiles:
+        raise Exception(f"Неизвестный профиль вывода: {name}")
+    profile = dict(profiles[name])
+    profile["name"] = name
+    fmt = profile.get("format", "PNG").upper()
+    if fmt not in _EXTENSIONS:
+        raise Exception(f"Неподдерживаемый формат {fmt} в профиле {name}")
+    profile["format"] = fmt
+    return profile
+
+
+def profile_for_sheets(settings, sheet_names, default_profile):
+    """
+    Pick the profile for a card from the sheets that contributed its overlays:
+    the first sheet with an entry in "sheet_output_profiles" wins, otherwise default_profile.
+    """
+    sheet_profiles = settings.get("sheet_output_profiles", {})
+    for sheet_name in sheet_names:
+        if sheet_name in sheet_profiles:
+            return get_profile(settings, sheet_profiles[sheet_name])
+    return default_profile
+
+
+def profile_extension(profile):
+    """Get the output file extension for a profile."""
+    return _EXTENSIONS[profile["format"]]
+
+
+def save_image(image, path, profile):
+    """Encode and save an image with the options of a profile."""
+    fmt = profile["format"]
+    options = {key: profile[key] for key in _SAVE_OPTIONS[fmt] if key in profile}
+    image.save(path, format=fmt, **options)
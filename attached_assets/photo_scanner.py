@@ -0,0 +1,55 @@
+import os
+
+# Расширения файлов, которые считаются фотографиями артикула
+ALLOWED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def _sorted_entries(directory):
+    """List a directory once with os.scandir; DirEntry keeps the file type from the listing."""
+    with os.scandir(directory) as it:
+        return sorted(it, key=lambda entry: entry.name)
+
+
+def _image_paths(entries, extensions):
+    return [entry.path for entry in entries
+            if entry.name.lower().endswith(extensions) and entry.is_file()]
+
+
+def list_images(directory, extensions=ALLOWED_EXTENSIONS):
+    """Get the sorted image paths directly inside a directory."""
+    return _image_paths(_sorted_entries(directory), tuple(extensions))
+
+
+def scan_articles(photos_dir, max_depth=1, extensions=ALLOWED_EXTENSIONS):
+    """
+    Lazily walk photos_dir and yield (article, [sorted image paths]) for every
+    directory up to max_depth levels deep that contains images.
+    The article is the directory name; max_depth=1 matches the flat layout
+    photos/<article>/<photo>, larger values also find nested article folders.
+    Each directory is yielded as soon as it is listed, before its subfolders.
+    """
+    extensions = tuple(extensions)
+
+    def walk(directory, depth):
+        try:
+            entries = _sorted_entries(directory)
+        except OSError as e:
+            print(f"Ошибка чтения директории {directory}: {e}")
+            return
+
+        if depth > 0:
+            images = _image_paths(entries, extensions)
+            if images:
+                yield os.path.basename(directory), images
+
+        if depth < max_depth:
+            for entry in entries:
+                if entry.is_dir():
+                    yield from walk(entry.path, depth + 1)
+
+    yield from walk(photos_dir, 0)
+
+
+def article_relpath(photos_dir, image_paths):
+    """Get the article directory relative to photos_dir (used for the output layout)."""
+    return os.path.relpath(os.path.dirname(image_paths[0]), photos_dir)
@@ -4,6 +4,8 @@ import numpy as np
 from PIL import Image, ImageDraw
 import io
 
+from attached_assets.position_formula import evaluate_formula
+
 class PositionEditor:
     """
     Handles the position editor UI and logic.
@@ -126,8 +128,8 @@ class PositionEditor:
                             "infografika_height": 300,
                             "MARGIN": 30
                         }
-                        eval(x_formula, {"__builtins__": {}}, context)
-                        eval(y_formula, {"__builtins__": {}}, context)
+                        evaluate_formula(x_formula, context)
+                        evaluate_formula(y_formula, context)
                         
                         # Save position
                         if position_id in positions:
@@ -252,14 +254,16 @@ class PositionEditor:
                 
                 # Validate positions data
                 if isinstance(positions_data, dict):
-                    for pos_id, pos_config in positions_data.items():
-                        if isinstance(pos_config, dict) and "x" in pos_config and "y" in pos_config:
-                            self.config_manager.add_position(
-                                pos_id, 
-                                pos_config["x"], 
-                                pos_config["y"], 
-                                pos_config.get("anchor", "top-left")
-                            )
+                    # Весь импорт — одна транзакция: одна запись файла, откат при ошибке
+                    with self.config_manager.batch():
+                        for pos_id, pos_config in positions_data.items():
+                            if isinstance(pos_config, dict) and "x" in pos_config and "y" in pos_config:
+                                self.config_manager.add_position(
+                                    pos_id, 
+                                    pos_config["x"], 
+                                    pos_config["y"], 
+                                    pos_config.get("anchor", "top-left")
+                                )
                     
                     st.success("Positions imported successfully!")
                     st.rerun()
@@ -0,0 +1,109 @@
+import ast
+from functools import lru_cache
+
+# Переменные, доступные в формулах позиций
+FORMULA_VARIABLES = ("canvas_width", "canvas_height", "infografika_width", "infografika_height", "MARGIN")
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.UAdd, ast.USub,
+)
+
+# Предел числа запомненных результатов на одну позицию
+_MEMO_LIMIT = 1024
+
+
+class PositionFormulaError(ValueError):
+    """Raised when a position formula cannot be parsed or evaluated."""
+
+
+def _validate(formula):
+    """Parse a formula and check that it only uses arithmetic on known variables."""
+    if not isinstance(formula, str) or not formula.strip():
+        raise PositionFormulaError("Пустая формула")
+    try:
+        tree = ast.parse(formula.strip(), mode="eval")
+    except SyntaxError as e:
+        raise PositionFormulaError(f"Синтаксическая ошибка в формуле '{formula}': {e.msg}")
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise PositionFormulaError(
+                f"Недопустимая конструкция {type(node).__name__} в формуле '{formula}'")
+        if isinstance(node, ast.Constant) and (
+                isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+            raise PositionFormulaError(f"Недопустимая константа {node.value!r} в формуле '{formula}'")
+        if isinstance(node, ast.Name) and node.id not in FORMULA_VARIABLES:
+            raise PositionFormulaError(f"Неизвестная переменная {node.id} в формуле '{formula}'")
+    return tree
+
+
+@lru_cache(maxsize=256)
+def compile_formula(formula):
+    """Validate a formula once and return its code object."""
+    return compile(_validate(formula), "<position formula>", "eval")
+
+
+def evaluate_formula(formula, context):
+    """Evaluate a formula with the given variables (a subset of FORMULA_VARIABLES)."""
+    try:
+        return eval(compile_formula(formula), {"__builtins__": {}}, dict(context))
+    except PositionFormulaError:
+        raise
+    except Exception as e:
+        raise PositionFormulaError(f"Ошибка вычисления формулы '{formula}': {e}")
+
+
+class CompiledPosition:
+    """
+    A position whose x/y formulas are validated and compiled once into a single
+    function of (canvas_width, canvas_height, infografika_width, infografika_height, MARGIN).
+    Resolved coordinates, including the anchor adjustment, are memoized per size tuple.
+    """
+
+    def __init__(self, x_formula, y_formula, anchor="top-left"):
+        """Compile the formulas; raises PositionFormulaError if either is invalid."""
+        self.x_formula = x_formula
+        self.y_formula = y_formula
+        self.anchor = anchor or "top-left"
+
+        # Обе проверенные формулы объединяются в одну lambda на уровне AST
+        x_tree = _validate(x_formula)
+        y_tree = _validate(y_formula)
+        args = ast.arguments(posonlyargs=[], args=[ast.arg(arg=name) for name in FORMULA_VARIABLES],
+                             kwonlyargs=[], kw_defaults=[], defaults=[])
+        body = ast.Tuple(elts=[x_tree.body, y_tree.body], ctx=ast.Load())
+        tree = ast.fix_missing_locations(ast.Expression(body=ast.Lambda(args=args, body=body)))
+        self._func = eval(compile(tree, "<position formula>", "eval"), {"__builtins__": {}})
+        self._memo = {}
+
+    def resolve(self, canvas_width, canvas_height, infografika_width, infografika_height, margin):
+        """Get the top-left pixel position for the given sizes."""
+        key = (canvas_width, canvas_height, infografika_width, infografika_height, margin)
+        result = self._memo.get(key)
+        if result is None:
+            result = self._compute(*key)
+            if len(self._memo) >= _MEMO_LIMIT:
+                self._memo.clear()
+            self._memo[key] = result
+        return result
+
+    def _compute(self, canvas_width, canvas_height, infografika_width, infografika_height, margin):
+        try:
+            x, y = self._func(canvas_width, canvas_height, infografika_width, infografika_height, margin)
+        except Exception as e:
+            raise PositionFormulaError(f"Ошибка вычисления формулы позиции: {e}")
+
+        # Adjust X based on anchor
+        if "center" in self.anchor:
+            x -= infografika_width // 2
+        elif "right" in self.anchor:
+            x -= infografika_width
+
+        # Adjust Y based on anchor
+        if "middle" in self.anchor:
+            y -= infografika_height // 2
+        elif "bottom" in self.anchor:
+            y -= infografika_height
+
+        return int(x), int(y)
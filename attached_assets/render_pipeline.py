@@ -0,0 +1,195 @@
+import time
+import queue
+import threading
+
+from attached_assets.memory_governor import estimate_card_bytes
+
+# Метка конца потока задач в очередях
+_DONE = object()
+
+
+class StageStats:
+    """Busy time and item count of one pipeline stage."""
+
+    def __init__(self):
+        self.busy = 0.0
+        self.items = 0
+
+    def add(self, seconds):
+        self.busy += seconds
+        self.items += 1
+
+    def summary(self, elapsed):
+        """Get the stats as a dict; utilization is the busy share of the wall time."""
+        return {
+            "items": self.items,
+            "busy": round(self.busy, 3),
+            "utilization": round(self.busy / elapsed, 3) if elapsed > 0 else 0.0,
+        }
+
+
+class QueueStats:
+    """Depth of a bounded queue, sampled every time an item is put into it."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.samples = 0
+        self.total = 0
+        self.max = 0
+
+    def sample(self, depth):
+        self.samples += 1
+        self.total += depth
+        self.max = max(self.max, depth)
+
+    def summary(self):
+        return {
+            "maxsize": self.maxsize,
+            "avg_depth": round(self.total / self.samples, 2) if self.samples else 0.0,
+            "max_depth": self.max,
+        }
+
+
+class RenderPipeline:
+    """
+    Staged in-process rendering: reader -> renderer -> writer, connected by bounded queues.
+    The reader thread decodes the next photos (ImageProcessor.load_source) while the
+    current card is composited, and the writer thread encodes and saves finished cards,
+    so disk I/O overlaps with CPU work; Pillow releases the GIL while decoding,
+    resampling and encoding. The renderer runs in the thread iterating imap().
+    Stage utilization and queue depths are kept in self.stats: a full queue in front
+    of a stage and its high utilization point at the bottleneck.
+    With a MemoryBudget, the reader decodes a photo only once the estimated memory
+    of the card fits into the budget; it is released when the card is saved.
+    """
+
+    def __init__(self, image_processor, depth=4, memory_budget=None):
+        """Initialize with the processor and the size of both queues (cards in flight)."""
+        self.image_processor = image_processor
+        self.depth = max(1, int(depth))
+        self.memory_budget = memory_budget
+        self.stats = None
+
+    def imap(self, tasks):
+        """
+        Render tasks and yield (task, error) pairs as cards are finished
+        (a card that fails before the writer may overtake the ones being written).
+        """
+        read_queue = queue.Queue(self.depth)
+        write_queue = queue.Queue(self.depth)
+        done_queue = queue.Queue()
+        stop = threading.Event()
+        stages = {"reader": StageStats(), "renderer": StageStats(), "writer": StageStats()}
+        queues = {"read_queue": QueueStats(self.depth), "write_queue": QueueStats(self.depth)}
+
+        def put(target, stats, item):
+            # Ожидание места в очереди с проверкой остановки конвейера
+            stats.sample(target.qsize())
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def reserve(task):
+            # Ожидание места в бюджете памяти; 0 — без бюджета или без оценки
+            if self.memory_budget is None:
+                return 0
+            try:
+                nbytes = estimate_card_bytes(self.image_processor, task)
+            except Exception:
+                return 0
+            return nbytes if self.memory_budget.acquire(nbytes, stop) else None
+
+        def release(nbytes):
+            if nbytes:
+                self.memory_budget.release(nbytes)
+
+        def reader():
+            try:
+                for task in tasks:
+                    nbytes = reserve(task)
+                    if nbytes is None:
+                        return
+                    start = time.perf_counter()
+                    try:
+                        source, error = self.image_processor.load_card_source(task), None
+                    except Exception as e:
+                        source, error = None, f"Ошибка обработки изображения {task.photo_path}: {e}"
+                    stages["reader"].add(time.perf_counter() - start)
+                    if not put(read_queue, queues["read_queue"], (task, nbytes, source, error)):
+                        return
+            except Exception as e:
+                put(read_queue, queues["read_queue"], (None, 0, None, e))
+            put(read_queue, queues["read_queue"], _DONE)
+
+        def writer():
+            while True:
+                try:
+                    item = write_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                if item is _DONE:
+                    return
+                task, nbytes, composed = item
+                start = time.perf_counter()
+                try:
+                    self.image_processor.save_card(task, composed)
+                    error = None
+                except Exception as e:
+                    error = str(e)
+                # Холсты освобождаются до возврата бюджета
+                item = composed = None
+                release(nbytes)
+                stages["writer"].add(time.perf_counter() - start)
+                done_queue.put((task, error))
+
+        start_time = time.perf_counter()
+        threads = [threading.Thread(target=reader, name="pipeline-reader", daemon=True),
+                   threading.Thread(target=writer, name="pipeline-writer", daemon=True)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = read_queue.get()
+                if item is _DONE:
+                    break
+                task, nbytes, source, error = item
+                item = None
+                if task is None:
+                    # Ошибка в источнике задач — прерываем обработку
+                    raise error
+                if error is None:
+                    start = time.perf_counter()
+                    try:
+                        composed = self.image_processor.compose_card(task, source)
+                    except Exception as e:
+                        error = str(e)
+                    stages["renderer"].add(time.perf_counter() - start)
+                del source
+                if error is None:
+                    put(write_queue, queues["write_queue"], (task, nbytes, composed))
+                    composed = None
+                else:
+                    release(nbytes)
+                    done_queue.put((task, error))
+
+                # Готовые карточки отдаются сразу, не дожидаясь конца конвейера
+                while not done_queue.empty():
+                    yield done_queue.get()
+
+            write_queue.put(_DONE)
+            threads[1].join()
+            while not done_queue.empty():
+                yield done_queue.get()
+        finally:
+            stop.set()
+            elapsed = time.perf_counter() - start_time
+            self.stats = {name: stage.summary(elapsed) for name, stage in stages.items()}
+            self.stats.update({name: stats.summary() for name, stats in queues.items()})
+            self.stats["bottleneck"] = max(stages, key=lambda name: stages[name].busy)
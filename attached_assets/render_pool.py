@@ -0,0 +1,149 @@
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from attached_assets.memory_governor import estimate_card_bytes, process_peak_rss_bytes
+
+# Состояние процесса-воркера: заполняется инициализатором пула
+_worker_processor = None
+
+
+def resolve_workers(workers):
+    """Resolve the `workers` setting: 0 or less means all available cores."""
+    workers = int(workers or 1)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def _init_worker(image_processor):
+    """Store the pickled ImageProcessor in the worker process."""
+    global _worker_processor
+    _worker_processor = image_processor
+
+
+def _render_task(task):
+    """
+    Render one card in a worker.
+    Returns (error message or None, peak RSS of the worker process in bytes or None).
+    """
+    try:
+        _worker_processor.render_card(task)
+        error = None
+    except Exception as e:
+        error = str(e)
+    return error, process_peak_rss_bytes()
+
+
+class RenderPool:
+    """
+    Process pool that renders card tasks in parallel.
+    Each task is one (article, photo) card with all its output sizes; results come
+    back in task order, so progress reporting stays ordered and output matches the
+    serial path.
+    """
+
+    def __init__(self, image_processor, workers, memory_budget=None):
+        """
+        Initialize with the processor to replicate into every worker.
+        With a MemoryBudget, a task is submitted only once its estimated peak
+        memory fits into the budget next to the tasks already in flight.
+        """
+        self.image_processor = image_processor
+        self.workers = resolve_workers(workers)
+        self.memory_budget = memory_budget
+        # Наибольший пиковый RSS, о котором сообщили воркеры этого пула, в байтах
+        self.worker_peak_rss = None
+        self._peak_lock = threading.Lock()
+        self._executor = None
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.image_processor,),
+        )
+
+    def start(self):
+        """
+        Keep the worker processes alive between imap() calls, so their caches stay
+        warm for the following batches (see close()).
+        """
+        if self._executor is None:
+            self._executor = self._create_executor()
+        return self
+
+    def close(self):
+        """Shut down the workers kept alive by start()."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _reserve_memory(self, task):
+        """Wait until the task fits into the memory budget. Returns the reserved bytes."""
+        if self.memory_budget is None:
+            return 0
+        try:
+            nbytes = estimate_card_bytes(self.image_processor, task)
+        except Exception:
+            # Заголовок не читается — карточка все равно завершится ошибкой
+            return 0
+        self.memory_budget.acquire(nbytes)
+        return nbytes
+
+    def _task_result(self, result):
+        """Unpack the result of _render_task, keeping the largest worker peak RSS."""
+        error, peak = result
+        if peak is not None:
+            with self._peak_lock:
+                if self.worker_peak_rss is None or peak > self.worker_peak_rss:
+                    self.worker_peak_rss = peak
+        return error
+
+    def submit(self, task):
+        """
+        Render a single task on the workers kept alive by start().
+        Returns the error message or None once the card is done; safe to call
+        from several threads.
+        """
+        if self._executor is None:
+            raise Exception("Пул процессов не запущен")
+        nbytes = self._reserve_memory(task)
+        future = self._executor.submit(_render_task, task)
+        if nbytes:
+            future.add_done_callback(lambda _: self.memory_budget.release(nbytes))
+        return self._task_result(future.result())
+
+    def imap(self, tasks):
+        """
+        Render tasks and yield (task, error) pairs in task order.
+        Tasks are submitted as they are taken from the iterable, keeping at most
+        a few tasks per worker in flight, so a lazy task source starts rendering
+        immediately. Uses the spawn start method, so it is safe to call from a Qt thread.
+        Without start() the workers live for this call only.
+        """
+        if self._executor is not None:
+            yield from self._imap(self._executor, tasks)
+            return
+        with self._create_executor() as executor:
+            yield from self._imap(executor, tasks)
+
+    def _imap(self, executor, tasks):
+        max_in_flight = self.workers * 4
+        pending = deque()
+        for task in tasks:
+            nbytes = self._reserve_memory(task)
+            future = executor.submit(_render_task, task)
+            if nbytes:
+                future.add_done_callback(lambda _, nbytes=nbytes: self.memory_budget.release(nbytes))
+            pending.append((task, future))
+            # Отдаем готовые результаты по порядку, не дожидаясь заполнения окна
+            while pending and (len(pending) >= max_in_flight or pending[0][1].done()):
+                done_task, future = pending.popleft()
+                yield done_task, self._task_result(future.result())
+        while pending:
+            done_task, future = pending.popleft()
+            yield done_task, self._task_result(future.result())
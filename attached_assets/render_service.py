@@ -0,0 +1,286 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from attached_assets.slide_index import SlideIndex
+from attached_assets.render_pool import RenderPool, resolve_workers
+from attached_assets.build_manifest import BuildManifest
+from attached_assets.photo_scanner import scan_articles, article_relpath
+from attached_assets.output_profiles import get_profile, profile_extension
+from attached_assets.marketplace_variants import parse_variants
+from attached_assets.memory_governor import create_budget
+
+CONTENT_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+# Допустимый размер холста, как в редакторе настроек
+MIN_CANVAS_SIZE = 100
+MAX_CANVAS_SIZE = 5000
+
+
+class CardNotFoundError(LookupError):
+    """Raised when the requested article or slide does not exist."""
+
+
+class CardRequestError(ValueError):
+    """Raised when the request parameters are invalid."""
+
+
+class RenderService:
+    """
+    On-demand rendering of single cards with warm state: the Excel index (re-read
+    when the file changes), the article folders, the decoded overlays and the
+    compiled positions are kept between requests.
+    Rendered cards are stored in cache_dir under their input hash, which also
+    serves as the ETag, so a repeated request is answered from disk.
+    """
+
+    def __init__(self, image_processor, excel_file, photos_dir, infografika_dir, cache_dir,
+                 scan_depth=1, workers=1, variants=None, rescan_interval=2.0,
+                 output_profile=None, memory_budget_mb=None):
+        """
+        Initialize the service. With workers > 1 cards are rendered in a process pool,
+        otherwise in the request threads. A missing article triggers a rescan of
+        photos_dir at most every rescan_interval seconds.
+        output_profile is the profile of cards requested without a format (default:
+        the "output_profile" setting; "sheet_output_profiles" still apply);
+        memory_budget_mb (default: the "memory_budget_mb" setting) caps the memory
+        of the cards in the worker pool.
+        """
+        self.image_processor = image_processor
+        self.config_manager = image_processor.config_manager
+        self.excel_file = excel_file
+        self.photos_dir = photos_dir
+        self.infografika_dir = infografika_dir
+        self.cache_dir = cache_dir
+        self.scan_depth = scan_depth
+        self.variants = parse_variants(variants)
+        self.rescan_interval = rescan_interval
+        settings = self.config_manager.get_settings()
+        self.profile = get_profile(settings, output_profile)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        # Хэши входных файлов кэшируются по размеру и времени изменения
+        self.manifest = BuildManifest(cache_dir)
+
+        self.workers = resolve_workers(workers)
+        if memory_budget_mb is None:
+            memory_budget_mb = settings.get("memory_budget_mb", 0)
+        if self.workers > 1:
+            memory_budget = create_budget(memory_budget_mb, self.workers)
+            self.pool = RenderPool(image_processor, self.workers, memory_budget).start()
+        else:
+            self.pool = None
+
+        self._lock = threading.Lock()
+        self.slide_index = None
+        self._excel_signature = None
+        self._articles = {}
+        self._last_scan = None
+        self._current_index()
+        with self._lock:
+            self._rescan()
+
+    def close(self):
+        """Save the input hashes and stop the worker pool."""
+        self.manifest.save()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def health(self):
+        """Get the service state for monitoring."""
+        return {"status": "ok", "articles": len(self._articles), "workers": self.workers}
+
+    def _current_index(self):
+        """Get the slide index, re-reading the Excel file if it changed."""
+        with self._lock:
+            stat = os.stat(self.excel_file)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if signature != self._excel_signature:
+                self.slide_index = SlideIndex.from_excel(self.excel_file)
+                self._excel_signature = signature
+                print(f"Загружен Excel файл {self.excel_file}: {len(self.slide_index)} слайдов")
+            return self.slide_index
+
+    def _rescan(self):
+        """Rescan the article folders unless it was done recently. Returns True if rescanned."""
+        now = time.monotonic()
+        if self._last_scan is not None and now - self._last_scan < self.rescan_interval:
+            return False
+        articles = {}
+        for article, image_paths in scan_articles(self.photos_dir, max_depth=self.scan_depth):
+            if article in articles:
+                # В адресе карточки только артикул: папки с тем же именем неразличимы
+                print(f"Предупреждение: артикул {article} найден в нескольких папках, "
+                      f"используется {article_relpath(self.photos_dir, articles[article])}, "
+                      f"пропущена {article_relpath(self.photos_dir, image_paths)}")
+                continue
+            articles[article] = image_paths
+        self._articles = articles
+        self._last_scan = now
+        print(f"Найдено артикулов: {len(articles)}")
+        return True
+
+    def _photo_path(self, article, slide):
+        """Get the photo of a slide (1-based), rescanning the folders on a miss."""
+        with self._lock:
+            while True:
+                image_paths = self._articles.get(article)
+                if image_paths and slide <= len(image_paths) and os.path.exists(image_paths[slide - 1]):
+                    return image_paths[slide - 1]
+                if not self._rescan():
+                    break
+        if not image_paths:
+            raise CardNotFoundError(f"Артикул {article} не найден")
+        raise CardNotFoundError(f"Слайд {slide} не найден для артикула {article}")
+
+    def render(self, article, slide, width=None, height=None, profile_name=None, variant=None):
+        """
+        Get a card, rendering it on a cache miss.
+        slide is 1-based; width and height default to the canvas size from settings,
+        profile_name to the profile of the card's sheets or the service profile,
+        variant to no marketplace variant.
+        Returns (path of the cached file, ETag, content type).
+        """
+        settings = self.config_manager.get_settings()
+        width = settings.get("canvas_width", 900) if width is None else width
+        height = settings.get("canvas_height", 1200) if height is None else height
+        for value in (width, height):
+            if not MIN_CANVAS_SIZE <= value <= MAX_CANVAS_SIZE:
+                raise CardRequestError(
+                    f"Размер холста должен быть от {MIN_CANVAS_SIZE} до {MAX_CANVAS_SIZE}: {value}")
+        if slide < 1:
+            raise CardRequestError(f"Номер слайда начинается с 1: {slide}")
+
+        profile = None
+        if profile_name:
+            try:
+                profile = get_profile(settings, profile_name)
+            except Exception as e:
+                raise CardRequestError(str(e))
+        variants = self.variants
+        if variant and variant not in variants:
+            variants = variants + [variant]
+
+        slide_index = self._current_index()
+        photo_path = self._photo_path(article, slide)
+        task = self.image_processor.card_task(
+            slide_index, article, slide - 1, photo_path, self.infografika_dir,
+            [(variant or None, width, height, self.cache_dir)], variants, profile or self.profile
+        )
+        if profile is not None:
+            # Явно запрошенный формат важнее профиля листа
+            task = task._replace(output_profile=profile)
+
+        output = task.outputs[0]
+        etag = self.image_processor.output_key(self.manifest, task, output)
+        path = os.path.join(self.cache_dir, etag[:2], etag + profile_extension(task.output_profile))
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Карточка пишется во временный файл потока и атомарно переименовывается
+            render_path = f"{path}.{threading.get_ident()}.tmp"
+            self._render(task._replace(outputs=(output._replace(path=render_path),)))
+            os.replace(render_path, path)
+        return path, etag, CONTENT_TYPES[task.output_profile["format"]]
+
+    def _render(self, task):
+        """Render a task in the pool or in the calling thread. Raises on errors."""
+        if self.pool is not None:
+            error = self.pool.submit(task)
+        else:
+            error = self.image_processor._render_card_safe(task)[1]
+        if error:
+            raise Exception(error)
+
+
+def _int_param(query, name):
+    """Get an optional integer query parameter."""
+    if name not in query:
+        return None
+    try:
+        return int(query[name][0])
+    except ValueError:
+        raise CardRequestError(f"Параметр {name} должен быть целым числом")
+
+
+class CardRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /card/<article>/<slide>?w=&h=&format=&variant= returns the card image;
+    GET /health returns the service state as JSON.
+    """
+    server_version = "CardGenerator/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        service = self.server.service
+
+        if parts == ["health"]:
+            self._send_json(200, service.health())
+            return
+        if len(parts) != 3 or parts[0] != "card":
+            self._send_json(404, {"error": f"Неизвестный адрес: {url.path}"})
+            return
+
+        start_time = time.perf_counter()
+        query = parse_qs(url.query)
+        try:
+            try:
+                slide = int(parts[2])
+            except ValueError:
+                raise CardRequestError(f"Номер слайда должен быть целым числом: {parts[2]}")
+            path, etag, content_type = service.render(
+                parts[1], slide, _int_param(query, "w"), _int_param(query, "h"),
+                query.get("format", [None])[0], query.get("variant", [None])[0]
+            )
+        except CardNotFoundError as e:
+            self._send_json(404, {"error": str(e)})
+            return
+        except CardRequestError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"Ошибка генерации карточки: {e}"})
+            return
+
+        quoted_etag = f'"{etag}"'
+        if quoted_etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", quoted_etag)
+            self.end_headers()
+            return
+
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", quoted_etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Render-Time", f"{(time.perf_counter() - start_time) * 1000:.1f}ms")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Журнал запросов идет через print, как и остальной вывод приложения
+        print(f"{self.address_string()} - {format % args}")
+
+
+class RenderServer(ThreadingHTTPServer):
+    """HTTP server of a RenderService; every request is handled in its own thread."""
+    daemon_threads = True
+
+    def __init__(self, server_address, service):
+        super().__init__(server_address, CardRequestHandler)
+        self.service = service
@@ -0,0 +1,88 @@
+class SlideIndex:
+    """
+    In-memory index of infographic assignments from the Excel workbook.
+    Maps (article, slide_idx) to a list of (sheet, infografika_name, position)
+    entries, in sheet order. The workbook is parsed exactly once.
+    """
+
+    def __init__(self, sheet_names, entries):
+        """Initialize with sheet names and a prepared {(article, slide_idx): [...]} dict."""
+        self.sheet_names = list(sheet_names)
+        self._entries = entries
+        self._articles = {article for article, _ in entries}
+
+    @classmethod
+    def from_excel(cls, excel_file):
+        """
+        Build the index from an Excel file.
+        Each sheet row is: article, then (infografika_name, position) pairs per slide.
+        """
+        # pandas импортируется только здесь: модуль не должен замедлять запуск CLI
+        import pandas as pd
+        
+        try:
+            xl = pd.ExcelFile(excel_file)
+            sheet_names = xl.sheet_names
+        except Exception as e:
+            raise Exception(f"Ошибка чтения Excel файла: {str(e)}")
+
+        entries = {}
+        for sheet_name in sheet_names:
+            try:
+                df = xl.parse(sheet_name, dtype=str).fillna('')
+            except Exception as e:
+                print(f"Ошибка чтения листа {sheet_name}: {e}")
+                continue
+
+            # Как и раньше, последняя строка с тем же артикулом перекрывает предыдущие
+            articles_in_sheet = {row[0]: row[1:] for row in df.values.tolist() if row[0]}
+
+            for article, slides_data in articles_in_sheet.items():
+                for slide_idx in range(len(slides_data) // 2):
+                    infografika_name = slides_data[2 * slide_idx]
+                    position_str = slides_data[2 * slide_idx + 1]
+                    if not infografika_name or not position_str:
+                        continue
+                    try:
+                        position = int(position_str)
+                    except ValueError:
+                        print(f"Некорректная позиция '{position_str}' в листе {sheet_name} "
+                              f"для артикула {article}, слайд {slide_idx + 1}")
+                        continue
+                    entries.setdefault((article, slide_idx), []).append(
+                        (sheet_name, infografika_name, position)
+                    )
+
+        return cls(sheet_names, entries)
+
+    def get(self, article, slide_idx):
+        """Get the list of (sheet, infografika_name, position) entries for a slide."""
+        return self._entries.get((article, slide_idx), [])
+
+    def has_article(self, article):
+        """Check whether the article is present on any sheet."""
+        return article in self._articles
+
+    def positions(self):
+        """Get the set of position ids referenced anywhere in the workbook."""
+        return {position for entries in self._entries.values() for _, _, position in entries}
+
+    def articles(self):
+        """Get the set of articles present in the workbook."""
+        return set(self._articles)
+
+    def changed_articles(self, other):
+        """Get the articles whose entries differ between this index and other."""
+        mine = self._by_article()
+        theirs = other._by_article()
+        return {article for article in mine.keys() | theirs.keys()
+                if mine.get(article) != theirs.get(article)}
+
+    def _by_article(self):
+        by_article = {}
+        for (article, slide_idx), entries in self._entries.items():
+            by_article.setdefault(article, {})[slide_idx] = entries
+        return by_article
+
+    def __len__(self):
+        return len(self._entries)
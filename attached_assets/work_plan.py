@@ -0,0 +1,53 @@
+import time
+
+
+class WorkPlan:
+    """
+    Frozen list of card tasks for one run, computed once before rendering.
+    Holds the exact total for progress reporting and the input hashes of
+    the cards selected by an incremental build.
+    """
+
+    def __init__(self, tasks, card_keys=None, skipped=0):
+        """Initialize with the tasks to render, their input hashes and the number of unchanged cards."""
+        self.tasks = tuple(tasks)
+        self.card_keys = dict(card_keys or {})
+        self.skipped = skipped
+
+    @property
+    def total(self):
+        """Number of cards to render."""
+        return len(self.tasks)
+
+    def __iter__(self):
+        return iter(self.tasks)
+
+    def __len__(self):
+        return len(self.tasks)
+
+
+class ProgressReporter:
+    """
+    Counter-based progress reporting with optional throttling.
+    With max_rate set, the callback is invoked at most max_rate times per second;
+    the first and the final update are always delivered.
+    """
+
+    def __init__(self, callback, total, max_rate=None):
+        """Initialize with a callback(current, total), the total count and the rate limit."""
+        self.callback = callback
+        self.total = total
+        self.current = 0
+        self._interval = 1.0 / max_rate if max_rate else 0.0
+        self._last_emit = None
+
+    def advance(self, count=1):
+        """Mark count more items as done and report if due."""
+        self.current += count
+        if not self.callback:
+            return
+        now = time.monotonic()
+        if (self._last_emit is None or self.current >= self.total
+                or now - self._last_emit >= self._interval):
+            self._last_emit = now
+            self.callback(self.current, self.total)
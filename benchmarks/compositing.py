@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк наложения инфографики: компоновщик PIL против NumPy для карточек с 1–5 слоями.
+
+Пример:
+    python benchmarks/compositing.py photos/M2756926/M0252001/1.JPG --size 2000x3000
+"""
+import os
+import io
+import sys
+import time
+import argparse
+import contextlib
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_dir)
+
+from attached_assets.config_manager import ConfigManager
+from attached_assets.image_processor import ImageProcessor, CardTask
+
+
+def best_time(composite, base, repeat):
+    """Get the fastest of repeat runs of composite(canvas copy) and its last result."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        canvas = base.copy()
+        start = time.perf_counter()
+        result = composite(canvas)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение компоновщиков pil и numpy по времени наложения")
+    parser.add_argument("photo", help="Исходное фото")
+    parser.add_argument("--size", default="900x1200", help="Размер холста, ШxВ")
+    parser.add_argument("--infografika", default="infografika", help="Директория с инфографикой (PNG)")
+    parser.add_argument("--max-overlays", type=int, default=5, help="Наибольшее число слоев на карточке")
+    parser.add_argument("--repeat", type=int, default=20, help="Число повторов наложения")
+    parser.add_argument("--config", default="config.json", help="Файл конфигурации")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    config_manager = ConfigManager(args.config)
+    pil_processor = ImageProcessor(config_manager, "pil")
+    numpy_processor = ImageProcessor(config_manager, "numpy")
+    base = pil_processor.process_and_center_image(args.photo, width, height)
+
+    # Слои — первые PNG из директории инфографики на позициях из конфигурации по порядку
+    paths = sorted(os.path.join(args.infografika, name) for name in os.listdir(args.infografika)
+                   if name.lower().endswith(".png"))
+    positions = list(config_manager.get_positions()) or ["1"]
+    overlays = [("bench", os.path.basename(path), path, positions[index % len(positions)])
+                for index, path in enumerate(paths[:args.max_overlays])]
+    task = CardTask("bench", os.path.basename(args.photo), args.photo, (), overlays, None)
+
+    def composite_pil(canvas, count):
+        for _, _, path, position in overlays[:count]:
+            canvas = pil_processor.overlay_infografika(canvas, path, position)
+        return canvas
+
+    def composite_numpy(canvas, count):
+        return numpy_processor.composite_overlays(task, canvas, overlays[:count])
+
+    print(f"Холст {width}x{height}, повторов: {args.repeat}")
+    print(f"{'слоев':<8}{'pil, мс':>10}{'numpy, мс':>12}{'ускорение':>12}{'совпадает':>12}")
+    # Журнал наложения компоновщика numpy в таблицу не выводится
+    log = io.StringIO()
+    for count in range(1, len(overlays) + 1):
+        with contextlib.redirect_stdout(log):
+            # Прогрев: декодирование и подготовка массивов слоев кэшируются
+            composite_pil(base.copy(), count)
+            composite_numpy(base.copy(), count)
+            pil_time, pil_result = best_time(lambda canvas: composite_pil(canvas, count), base, args.repeat)
+            numpy_time, numpy_result = best_time(lambda canvas: composite_numpy(canvas, count), base, args.repeat)
+        same = "да" if pil_result.tobytes() == numpy_result.tobytes() else "нет"
+        print(f"{count:<8}{pil_time * 1000:>10.2f}{numpy_time * 1000:>12.2f}"
+              f"{pil_time / numpy_time:>11.2f}x{same:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк профилей вывода: время кодирования и размер файла для каждой карточки.
+
+Пример:
+    python benchmarks/output_profiles.py photos/M2756926/M0252001/1.JPG --size 2000x3000
+"""
+import os
+import io
+import sys
+import time
+import argparse
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root_dir)
+
+from attached_assets.config_manager import ConfigManager
+from attached_assets.image_processor import ImageProcessor
+from attached_assets.output_profiles import available_profiles, get_profile, save_image
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение профилей вывода по времени кодирования и размеру")
+    parser.add_argument("photo", help="Исходное фото")
+    parser.add_argument("--size", default="900x1200", help="Размер холста, ШxВ")
+    parser.add_argument("--repeat", type=int, default=5, help="Число повторов кодирования")
+    parser.add_argument("--config", default="config.json", help="Файл конфигурации")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    config_manager = ConfigManager(args.config)
+    settings = config_manager.get_settings()
+    canvas = ImageProcessor(config_manager).process_and_center_image(args.photo, width, height)
+
+    print(f"Холст {width}x{height}, повторов: {args.repeat}")
+    print(f"{'профиль':<12}{'формат':<8}{'кодирование, мс':>18}{'размер, КБ':>14}")
+    for name in sorted(available_profiles(settings)):
+        profile = get_profile(settings, name)
+        timings = []
+        for _ in range(args.repeat):
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            save_image(canvas, buffer, profile)
+            timings.append(time.perf_counter() - start)
+        print(f"{name:<12}{profile['format']:<8}{min(timings) * 1000:>18.1f}{buffer.tell() / 1024:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Консольный запуск пакетной обработки без графического интерфейса.
+Использование: python -m card_generator render [параметры]
+"""
+import os
+import sys
+
+# Добавляем корневую директорию проекта в путь Python
+root_dir = os.path.dirname(os.path.abspath(__file__))
+if root_dir not in sys.path:
+    sys.path.insert(0, root_dir)
+
+from attached_assets.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())